@@ -0,0 +1,33 @@
+"""Add composite title/episode/created_at index
+
+Revision ID: 7c3e9a1f4b20
+Revises: 52579467e8bc
+Create Date: 2026-10-14 10:12:31.512044
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e9a1f4b20'
+down_revision: Union[str, Sequence[str], None] = '52579467e8bc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_uploaded_files_title_ep_created',
+        'uploaded_files',
+        ['anime_title', 'episode', 'created_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_uploaded_files_title_ep_created', table_name='uploaded_files')
@@ -0,0 +1,42 @@
+"""Add a pg_trgm GIN index on anime.title
+
+Revision ID: b7f3c2d91e04
+Revises: e41b8d2c6a95
+Create Date: 2026-10-14 18:05:47.730615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f3c2d91e04'
+down_revision: Union[str, Sequence[str], None] = 'e41b8d2c6a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Lets PostgreSQL serve the API's ILIKE '%q%' title filters from an
+    # index; other backends have no trigram support and keep scanning.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_anime_title_trgm',
+        'anime',
+        ['title'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'title': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_anime_title_trgm', table_name='anime')
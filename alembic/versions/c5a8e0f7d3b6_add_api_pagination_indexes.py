@@ -0,0 +1,40 @@
+"""Add anime_id/episode and created_at/id indexes for API pagination
+
+Revision ID: c5a8e0f7d3b6
+Revises: b7f3c2d91e04
+Create Date: 2026-10-14 18:52:13.406271
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a8e0f7d3b6'
+down_revision: Union[str, Sequence[str], None] = 'b7f3c2d91e04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_uploaded_files_anime_ep',
+        'uploaded_files',
+        ['anime_id', 'episode'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_uploaded_files_created_id',
+        'uploaded_files',
+        ['created_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_uploaded_files_created_id', table_name='uploaded_files')
+    op.drop_index('ix_uploaded_files_anime_ep', table_name='uploaded_files')
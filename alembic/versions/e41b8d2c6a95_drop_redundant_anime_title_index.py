@@ -0,0 +1,29 @@
+"""Drop the single-column anime_title index
+
+Revision ID: e41b8d2c6a95
+Revises: 7c3e9a1f4b20
+Create Date: 2026-10-14 15:40:08.218903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41b8d2c6a95'
+down_revision: Union[str, Sequence[str], None] = '7c3e9a1f4b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ix_uploaded_files_title_ep_created leads with anime_title and covers it
+    op.drop_index(op.f('ix_uploaded_files_anime_title'), table_name='uploaded_files')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_uploaded_files_anime_title'), 'uploaded_files', ['anime_title'], unique=False)
@@ -1,5 +1,13 @@
 import asyncio
 from src.anime_bot.bot import main
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
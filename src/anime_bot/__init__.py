@@ -4,9 +4,18 @@ Anime Bot - A Telegram bot for downloading and uploading anime episodes.
 This package provides functionality to search for anime, download episodes
 from AnimePahe, and upload them to Telegram.
 """
-from .bot import client, main
 
 __all__ = ["client", "main"]
 
-# Import commands to register handlers (must be after client is defined)
-from .commands import ping, list, start, track  # noqa: F401
\ No newline at end of file
+
+def __getattr__(name: str):
+    """Import the bot module on first access to ``client`` or ``main``.
+
+    Keeps ``import src.anime_bot.models`` (used by the API) from pulling in
+    Telethon, Redis and anime_downloader.
+    """
+    if name in __all__:
+        from . import bot
+
+        return getattr(bot, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,22 +5,71 @@ Provides async wrappers around the anime_downloader library for fetching
 anime data, episodes, and managing downloads.
 """
 import asyncio
+import functools
 import logging
-from typing import List, Dict, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Dict, Optional, Callable
+
+import aiohttp
+import orjson
+
+from .config import settings
+from .constants import (
+    DEFAULT_NUM_THREADS,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_DNS_CACHE_TTL,
+)
+from .playlist_cache import load_cached_playlist, store_playlist
 
 logger = logging.getLogger(__name__)
 
-# Provided API from docs
-try:
-    from anime_downloader.api import AnimePaheAPI
-    from anime_downloader.api.downloader import Downloader
-    from anime_downloader.utils import constants, config_manager
-except Exception as exc:
-    # if import fails we'll surface a helpful error when used
-    AnimePaheAPI = None
-    Downloader = None
-    download_episode_async = None
-    logger.warning("anime_downloader imports failed: %s", exc)
+_http_session: Optional[aiohttp.ClientSession] = None
+
+# Blocking AnimePahe metadata calls (stream/playlist lookups) get their own
+# bounded pool so they never queue behind segment downloads or file I/O on
+# the loop's default executor. Threads are only spawned on first submit.
+_metadata_executor = ThreadPoolExecutor(
+    max_workers=settings.max_metadata_concurrency,
+    thread_name_prefix="animepahe-meta",
+)
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the process-wide aiohttp session, creating it if needed.
+
+    Every AnimePaheClient shares this session so TCP connections and TLS
+    handshakes are reused across requests and episodes. Must be called
+    from within a running event loop.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            )
+        )
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Close the process-wide aiohttp session if it is open."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+# Failures of a direct JSON API request (HTTP errors such as a 403
+# challenge, network errors, non-JSON bodies) that the library can retry
+_API_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, ValueError)
+
+
+def shutdown_metadata_executor() -> None:
+    """Stop the metadata thread pool, dropping any queued calls."""
+    _metadata_executor.shutdown(wait=False, cancel_futures=True)
 
 
 class AnimePaheClient:
@@ -35,28 +84,85 @@ class AnimePaheClient:
 
     def __init__(self, verify_ssl: bool = True) -> None:
         """Initialize the AnimePahe client."""
-        if AnimePaheAPI is None:
-            raise RuntimeError("anime_downloader.api.AnimePaheAPI not importable")
+        # Imported here so modules that only need the package (e.g. models)
+        # do not pay for anime_downloader's import-time setup.
+        try:
+            from anime_downloader.api import AnimePaheAPI
+            from anime_downloader.api.downloader import Downloader
+            from anime_downloader.utils import constants, config_manager
+        except Exception as exc:
+            raise RuntimeError("anime_downloader.api is not importable") from exc
         app_config = config_manager.load_config()
         if "base_url" in app_config and app_config["base_url"] != constants.BASE_URL:
             constants.set_base_url(app_config["base_url"])
         self._api = AnimePaheAPI(verify_ssl=verify_ssl)
+        # Built once and shared by every download; each call passes its own
+        # paths, so no lock is taken around it.
+        self._downloader = Downloader(self._api)
+        self._verify_ssl = verify_ssl
+        self._constants = constants
+
+    def _api_url(self) -> str:
+        """Return the JSON API URL on the host the library currently uses.
+
+        set_base_url (config) and the library's startup probe only update
+        constants.get_base_url(), never constants.BASE_URL.
+        """
+        return f"{self._constants.get_base_url().rstrip('/')}/api"
+
+    def _library_headers(self) -> Dict[str, str]:
+        """Return the headers of the library's HTTP session.
+
+        They include the user agent and the Cookie header built from the
+        library's clearance cookie. The library rebuilds its session when
+        that cookie changes, so this is read on every request.
+        """
+        return dict(self._api.http.headers)
+
+    async def _get_json(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Issue a GET against the AnimePahe JSON API and decode the body."""
+        async with get_http_session().get(
+            self._api_url(),
+            params=params,
+            headers=self._library_headers(),
+            ssl=self._verify_ssl,
+        ) as resp:
+            resp.raise_for_status()
+            # The API does not always send an application/json content type
+            return await resp.json(loads=orjson.loads, content_type=None)
+
+    async def _run_blocking(self, func: Callable, *args: Any) -> Any:
+        """Run a blocking library call on the metadata thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_metadata_executor, functools.partial(func, *args))
 
     async def search(self, query: str) -> List[Dict[str, str]]:
         """Search for anime by name.
 
+        Falls back to the library's search, which retries and can get past
+        challenge pages, if the direct request fails.
+
         Args:
             query: The search query string.
 
         Returns:
             List of anime results with title and session info.
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: self._api.search(query))
+        try:
+            data = await self._get_json({"m": "search", "q": query})
+        except _API_ERRORS as exc:
+            logger.warning("Direct search request failed (%s), using anime_downloader", exc)
+            return await self._run_blocking(self._api.search, query)
+        return data.get("data") or []
 
     async def fetch_episodes(self, anime_name: str, anime_slug: str) -> List[Dict]:
         """Fetch all episodes for an anime.
 
+        The first page tells us how many pages exist; the remaining pages
+        are then fetched concurrently. If any page fails, the whole list is
+        fetched again through the library, which retries each page and can
+        get past challenge pages.
+
         Args:
             anime_name: The name of the anime.
             anime_slug: The session/slug identifier.
@@ -64,10 +170,22 @@ class AnimePaheClient:
         Returns:
             List of episode dicts with episode number and session.
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(
-            None, lambda: self._api.fetch_episode_data(anime_name, anime_slug)
-        )
+        params = {"m": "release", "id": anime_slug, "sort": "episode_asc"}
+        try:
+            first = await self._get_json({**params, "page": 1})
+            episodes = list(first.get("data") or [])
+            last_page = int(first.get("last_page") or 1)
+            if last_page > 1:
+                pages = await asyncio.gather(
+                    *(self._get_json({**params, "page": page}) for page in range(2, last_page + 1))
+                )
+                for page in pages:
+                    episodes.extend(page.get("data") or [])
+        except _API_ERRORS as exc:
+            logger.warning("Direct episode request failed (%s), using anime_downloader", exc)
+            return await self._run_blocking(self._api.fetch_episode_data, anime_name, anime_slug)
+        logger.debug("Fetched %d episodes for %s", len(episodes), anime_name)
+        return episodes
 
     async def get_stream_url(
         self,
@@ -89,9 +207,9 @@ class AnimePaheClient:
         """
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(
-            None,
-            lambda: self._api.get_stream_url(
-                anime_slug, episode_session, quality=quality, audio=audio
+            _metadata_executor,
+            functools.partial(
+                self._api.get_stream_url, anime_slug, episode_session, quality=quality, audio=audio
             ),
         )
 
@@ -105,11 +223,15 @@ class AnimePaheClient:
             Playlist URL or None if not found.
         """
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: self._api.get_playlist_url(stream_url))
+        return await loop.run_in_executor(
+            _metadata_executor, functools.partial(self._api.get_playlist_url, stream_url)
+        )
 
     async def download_playlist(self, playlist_url: str, output_dir: str) -> Optional[str]:
         """Download a playlist file.
 
+        A fresh copy from the on-disk playlist cache is used when available.
+
         Args:
             playlist_url: URL of the M3U8 playlist.
             output_dir: Directory to save the playlist.
@@ -117,30 +239,38 @@ class AnimePaheClient:
         Returns:
             Path to the downloaded playlist file or None.
         """
-        if Downloader is None:
-            raise RuntimeError("Downloader not available")
-        downloader = Downloader(self._api)
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(
-            None, lambda: downloader.fetch_playlist(playlist_url, output_dir)
+            _metadata_executor,
+            functools.partial(self._fetch_playlist_cached, playlist_url, output_dir),
         )
 
-    async def download_from_playlist(self, playlist_path: str, num_threads: int = 50) -> bool:
+    def _fetch_playlist_cached(self, playlist_url: str, output_dir: str) -> Optional[str]:
+        """Blocking playlist fetch that reads through the playlist cache."""
+        cached = load_cached_playlist(playlist_url, output_dir)
+        if cached:
+            return cached
+        playlist_path = self._downloader.fetch_playlist(playlist_url, output_dir)
+        if playlist_path:
+            store_playlist(playlist_url, playlist_path)
+        return playlist_path
+
+    async def download_from_playlist(
+        self, playlist_path: str, num_threads: int = DEFAULT_NUM_THREADS
+    ) -> bool:
         """Download video segments from a playlist file.
 
         Args:
             playlist_path: Path to the local M3U8 playlist file.
-            num_threads: Number of concurrent download threads (default: 50).
+            num_threads: Number of concurrent download threads (default: DEFAULT_NUM_THREADS).
 
         Returns:
             True if download was successful.
         """
-        if Downloader is None:
-            raise RuntimeError("Downloader not available")
-        downloader = Downloader(self._api)
+        downloader = self._downloader
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(
-            None, lambda: downloader.download_from_playlist_cli(playlist_path, num_threads)
+            None, functools.partial(downloader.download_from_playlist_cli, playlist_path, num_threads)
         )
 
     async def compile_video(
@@ -159,10 +289,9 @@ class AnimePaheClient:
         Returns:
             True if compilation was successful.
         """
-        if Downloader is None:
-            raise RuntimeError("Downloader not available")
-        downloader = Downloader(self._api)
+        downloader = self._downloader
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(
-            None, lambda: downloader.compile_video(segment_dir, output_path, progress_callback)
+            None,
+            functools.partial(downloader.compile_video, segment_dir, output_path, progress_callback),
         )
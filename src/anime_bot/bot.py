@@ -5,8 +5,10 @@ This module contains the Telegram bot client, event handlers, and the main
 entry point for the application.
 """
 import asyncio
+import importlib
 import logging
-from typing import Dict, Any, Optional
+import re
+from typing import Callable, Set
 
 from telethon import TelegramClient, events, Button
 from telethon.tl.custom.message import Message
@@ -19,56 +21,109 @@ from .constants import (
     TITLE_TRUNCATE_LENGTH,
     EPISODES_PER_ROW,
     MAX_EPISODE_LIST_LENGTH,
-    TRUNCATED_EPISODE_LIST_LENGTH,
     DEFAULT_QUALITY,
     DEFAULT_AUDIO,
+    MAX_CALLBACK_DATA_BYTES,
+)
+from .logging_config import configure_logging, stop_logging
+from .db import init_db, get_latest_uploaded
+from .anime_api import (
+    AnimePaheClient,
+    get_http_session,
+    close_http_session,
+    shutdown_metadata_executor,
 )
-from .logging_config import configure_logging
-from .db import init_db, get_latest_uploaded, list_uploaded_for_anime
-from .anime_api import AnimePaheClient
 from .uploader import Uploader
 from .tasks import DownloadUploadTask
 from .utils import (
+    EP_SPEC_RE,
     validate_episode_spec,
     expand_episode_spec_to_list,
     pick_episodes_from_episode_list,
+    episode_number,
     load_from_cache,
-    fuzzy_score,
+    get_title_for_session,
+    rank_animes,
+    StatusEditor,
+    join_until,
 )
 from .cleanup import cleanup_loop
 from .redis_client import RedisClient
+from .session_store import get_session, put_session
+from .callback_data import (
+    CallbackTag,
+    dispatch_callback,
+    pack_int,
+    pack_str,
+    pack_tag,
+    register_callback,
+    unpack_int,
+    unpack_strs,
+)
 
-# Configure logging
-configure_logging()
 logger = logging.getLogger(__name__)
 
-# Ephemeral session store: chat_id -> dict with anime selection state
-# Keys: anime_slug, anime_title, available_episodes
-SESSION_STORE: Dict[int, Dict[str, Any]] = {}
-
 client = TelegramClient("anime_bot", settings.tg_api_id, settings.tg_api_hash)
-uploader = Uploader(client, concurrency=settings.max_upload_concurrency)
+uploader = Uploader(
+    client,
+    concurrency=settings.max_upload_concurrency,
+    per_chat_concurrency=settings.max_upload_per_chat,
+)
 api = AnimePaheClient(verify_ssl=False)
 
 stop_event = asyncio.Event()
 
+# At most `download_workers` DownloadUploadTasks run at once; the rest wait.
+# Running tasks are kept so they are not garbage collected and can be
+# cancelled cleanly on shutdown.
+_download_slots = asyncio.Semaphore(settings.download_workers)
+_live_tasks: Set[asyncio.Task] = set()
+
+# Handler patterns, compiled once at import
+SEARCH_RE = re.compile(r"^/search\s+(.+)$")
+DOWNLOAD_RE = re.compile(r"^/download\s+(\S+)\s+(.+)$")
+GET_RE = re.compile(r"^/get\s+(.+?)\s+(\d+)$")
+
+
+# Command modules that attach their handlers to `client` when imported
+COMMAND_MODULES = ("ping", "list", "start")
+
+
+def start_download_task(task: DownloadUploadTask, status_callback: Callable) -> None:
+    """Schedule a DownloadUploadTask behind the download concurrency limit.
+
+    Args:
+        task: The task to run.
+        status_callback: Callback receiving status text updates.
+    """
+    async def _run() -> None:
+        async with _download_slots:
+            try:
+                await task.run(status_callback=status_callback)
+            except Exception as exc:
+                logger.exception("Download task failed for %s", task.anime_title)
+                try:
+                    await status_callback(f"Task failed: {exc}")
+                except Exception:
+                    logger.debug("status callback failed")
+
+    running = asyncio.create_task(_run())
+    _live_tasks.add(running)
+    running.add_done_callback(_live_tasks.discard)
+
 
 async def on_startup() -> None:
     """Initialize the database and start the Telegram client."""
+    for name in COMMAND_MODULES:
+        importlib.import_module(f".commands.{name}", __package__)
     await init_db()
+    # Open the shared HTTP connection pool before the first request needs it
+    get_http_session()
     await client.start(bot_token=settings.tg_bot_token)
     logger.info("Bot started")
 
 
-# @client.on(events.NewMessage(pattern=r"^/start$"))
-# async def start_handler(event: events.NewMessage.Event) -> None:
-#     """Handle the /start command."""
-#     await event.reply(
-#         "Hello — send `/search <anime name>` to search for anime. "
-#         "After selecting an anime send an episode list like `1-3` or use `/download <slug> <spec>`."
-#     )
-
-@client.on(events.NewMessage(pattern=r"^/search\s+(.+)$"))
+@client.on(events.NewMessage(pattern=SEARCH_RE))
 async def search_handler(event: events.NewMessage.Event) -> None:
     """Handle the /search command to find anime by name."""
     query = event.pattern_match.group(1).strip()
@@ -86,49 +141,39 @@ async def search_handler(event: events.NewMessage.Event) -> None:
         return
 
     # build up to MAX_SEARCH_RESULTS result buttons
-    # TODO; update to implement search logic
-
-    # Score results quickly
-    scored = []
-    for result in results:
-        title = result.get("title") or result.get("name") or ""
-        score = fuzzy_score(title, query)
-        if score > 0:
-            scored.append((score, result))
-
-    # Sort by score descending and keep only MAX_SEARCH_RESULTS
-    # top_results = [r for _, r in sorted(scored, reverse=True)[:MAX_SEARCH_RESULTS]]
-    scores_sorted = sorted(scored, key=lambda x: x[0], reverse=True)
-    top_results = [result for _, result in scores_sorted[:MAX_SEARCH_RESULTS]]
+    top_results = rank_animes(results, query, MAX_SEARCH_RESULTS)
+    if not top_results:
+        await msg.edit(f"No results for `{query}`")
+        return
 
     buttons = []
     for result in top_results:
         title = result.get("title") or result.get("name")
         session = result.get("session")
         label = title if len(title) < MAX_TITLE_LENGTH else title[:TITLE_TRUNCATE_LENGTH] + "..."
-        payload = f"SELECT|{session}|{title}"
-        payload = f"SELECT|{session}"
-        buttons.append([Button.inline(label, payload.encode())])
+        # Carry the title too when it fits, so selecting needs no cache lookup
+        payload = pack_str(CallbackTag.SELECT, session)
+        if len(payload) + 1 + len(title.encode()) <= MAX_CALLBACK_DATA_BYTES:
+            payload = pack_str(CallbackTag.SELECT, session, title)
+        buttons.append([Button.inline(label, payload)])
 
     await msg.edit("Select an anime from results:", buttons=buttons)
 
-@client.on(events.CallbackQuery(pattern=b"SELECT"))
+@client.on(events.CallbackQuery())
+async def callback_handler(event: events.CallbackQuery.Event) -> None:
+    """Route every inline button press through the callback dispatcher."""
+    await dispatch_callback(event)
+
+
+@register_callback(CallbackTag.SELECT)
 async def select_callback(event: events.CallbackQuery.Event) -> None:
     """Handle anime selection callback from search results."""
-    # format: SELECT|session|title
-    data = event.data.decode()
-    # _, session, title = data.split("|",2)
-    _, session = data.split("|", 2)
+    session, *rest = unpack_strs(event.data)
     # chat_id = event._client._bot_token and event.sender_id or event.chat_id  # simpler to use event.chat_id
     chat_id = event.chat_id
 
-    # Get anime title from session
-    results = await load_from_cache(api)
-    title = None
-    for result in results:
-        if session == result.get("session"):
-            title = result.get("title")
-            break
+    # Title comes from the payload, or from the cached list if it did not fit
+    title = rest[0] if rest else await get_title_for_session(api, session)
 
     notice = await event.edit(f"Selected **{title}** — fetching episode list ...")
     try:
@@ -143,24 +188,22 @@ async def select_callback(event: events.CallbackQuery.Event) -> None:
         return
 
     # store in session
-    SESSION_STORE[chat_id] = {
-        "anime_slug": session,
-        "anime_title": title,
-        "available_episodes": eps,
-    }
-
-    # present first MAX_EPISODE_BUTTONS episodes as buttons
-    btns = []
-    for ep in eps[:MAX_EPISODE_BUTTONS]:
-        label = f"Ep {ep['episode']}"
-        payload = f"PICK_EP|{ep['episode']}"
-        btns.append(Button.inline(label, payload.encode()))
-
-    # split into rows of EPISODES_PER_ROW
-    rows = [btns[i : i + EPISODES_PER_ROW] for i in range(0, len(btns), EPISODES_PER_ROW)]
+    await put_session(chat_id, session, title, eps)
+
+    # present first MAX_EPISODE_BUTTONS episodes as buttons, EPISODES_PER_ROW per row.
+    # Fractional episodes (e.g. 12.5) cannot be stored, so they get no button.
+    shown = [num for ep in eps if (num := episode_number(ep["episode"])) is not None]
+    shown = shown[:MAX_EPISODE_BUTTONS]
+    rows = [
+        [
+            Button.inline(f"Ep {num}", pack_int(CallbackTag.PICK_EP, num))
+            for num in shown[i : i + EPISODES_PER_ROW]
+        ]
+        for i in range(0, len(shown), EPISODES_PER_ROW)
+    ]
     # add helper buttons
-    rows.append([Button.inline("List all episodes", b"LIST_ALL")])
-    rows.append([Button.inline("I'll send ep spec", b"SEND_SPEC")])
+    rows.append([Button.inline("List all episodes", pack_tag(CallbackTag.LIST_ALL))])
+    rows.append([Button.inline("I'll send ep spec", pack_tag(CallbackTag.SEND_SPEC))])
 
     await notice.edit(
         f"Fetched {len(eps)} episodes for **{title}**. Tap episode buttons to quickly select "
@@ -169,20 +212,16 @@ async def select_callback(event: events.CallbackQuery.Event) -> None:
         buttons=rows,
     )
 
-@client.on(events.CallbackQuery(pattern=b"PICK_EP"))
+@register_callback(CallbackTag.PICK_EP)
 async def pick_episode_callback(event: events.CallbackQuery.Event) -> None:
     """Handle single episode selection callback."""
-    # payload: PICK_EP|<num>
-    data = event.data.decode()
-    _, num = data.split("|", 2)
+    num = unpack_int(event.data)
     chat_id = event.chat_id
-    session_data = SESSION_STORE.get(chat_id)
+    session_data = await get_session(chat_id)
     if not session_data:
         await event.answer("Session expired. Please /search again.", alert=True)
         return
-    # find episode dict
-    eps = session_data["available_episodes"]
-    match = next((ep for ep in eps if str(ep["episode"]) == str(num)), None)
+    match = session_data["episodes_by_num"].get(num)
     if not match:
         await event.answer("Episode not found", alert=True)
         return
@@ -198,29 +237,31 @@ async def pick_episode_callback(event: events.CallbackQuery.Event) -> None:
         uploader,
         uploader_id=chat_id
     )
-    asyncio.create_task(task.run(status_callback=lambda t: status_msg.edit(t)))
+    start_download_task(task, StatusEditor(status_msg).set)
     await event.answer("Queued", alert=False)
 
-@client.on(events.CallbackQuery(pattern=b"LIST_ALL"))
+@register_callback(CallbackTag.LIST_ALL)
 async def list_all_callback(event: events.CallbackQuery.Event) -> None:
     """Handle callback to list all available episodes."""
     chat_id = event.chat_id
-    session_data = SESSION_STORE.get(chat_id)
+    session_data = await get_session(chat_id)
     if not session_data:
         await event.answer("Session expired. Please /search again.", alert=True)
         return
-    lines = [f"Ep {ep['episode']}" for ep in session_data["available_episodes"]]
-    txt = ", ".join(lines)
-    if len(txt) > MAX_EPISODE_LIST_LENGTH:
-        txt = txt[:TRUNCATED_EPISODE_LIST_LENGTH] + " ... (truncated) "
+    txt = join_until(
+        (f"Ep {ep['episode']}" for ep in session_data["episodes"]),
+        ", ",
+        MAX_EPISODE_LIST_LENGTH,
+        suffix=" ... (truncated) ",
+    )
     await event.respond(f"All episodes:\n{txt}")
 
 
-@client.on(events.CallbackQuery(pattern=b"SEND_SPEC"))
+@register_callback(CallbackTag.SEND_SPEC)
 async def send_spec_callback(event: events.CallbackQuery.Event) -> None:
     """Handle callback when user wants to send episode specification manually."""
     chat_id = event.chat_id
-    session_data = SESSION_STORE.get(chat_id)
+    session_data = await get_session(chat_id)
     if not session_data:
         await event.answer("Session expired. Please /search again.", alert=True)
         return
@@ -229,7 +270,7 @@ async def send_spec_callback(event: events.CallbackQuery.Event) -> None:
         "Use `/download <slug> <spec>` if you prefer."
     )
 
-@client.on(events.NewMessage(pattern=r"^/download\s+(\S+)\s+(.+)$"))
+@client.on(events.NewMessage(pattern=DOWNLOAD_RE))
 async def download_command(event: events.NewMessage.Event) -> None:
     """Handle the /download command to download specific episodes."""
     anime_slug = event.pattern_match.group(1).strip()
@@ -244,10 +285,18 @@ async def download_command(event: events.NewMessage.Event) -> None:
     # — but still support direct /download if user knows slug.
     # We'll attempt to fetch episodes using slug as both name and slug; if that fails, ask user to /search then send spec.
     status_msg = await event.reply(f"Checking if entered episode[s] are valid for {anime_slug} episodes: {spec}")
-    try:
-        eps = await api.fetch_episodes(anime_slug, anime_slug)
-    except Exception:
+    # Episode fetch and title lookup are independent, so run them together
+    eps, anime_title = await asyncio.gather(
+        api.fetch_episodes(anime_slug, anime_slug),
+        get_title_for_session(api, anime_slug),
+        return_exceptions=True,
+    )
+    if isinstance(eps, BaseException):
         eps = []
+    if isinstance(anime_title, BaseException):
+        logger.error("Loading from cache failed!", exc_info=anime_title)
+        return
+    anime_title = anime_title or anime_slug
     if not eps:
         await event.reply(
             "Could not fetch episodes using the provided slug. "
@@ -256,24 +305,11 @@ async def download_command(event: events.NewMessage.Event) -> None:
         return
 
     desired_nums = expand_episode_spec_to_list(spec)
-    chosen = [ep for ep in eps if int(ep["episode"]) in desired_nums]
+    chosen = pick_episodes_from_episode_list(eps, desired_nums)
     if not chosen:
         await event.reply("No matching episodes found for the spec.")
         return
 
-    # Try to fetch anime title using session [anime_slug]
-    anime_title = anime_slug
-    try:
-        results = await load_from_cache(api)
-        for result in results:
-            if result.get("session", "") == anime_slug:
-                if result.get("title", None):
-                    anime_title = result.get("title")
-                break
-    except Exception:
-        logger.exception("Loading from cache failed!")
-        return
-
     await status_msg.edit(f"Queued download for {anime_title} episodes {spec}")
     task = DownloadUploadTask(
         client,
@@ -286,33 +322,31 @@ async def download_command(event: events.NewMessage.Event) -> None:
         quality=DEFAULT_QUALITY,
         audio=DEFAULT_AUDIO,
     )
-    asyncio.create_task(task.run(status_callback=lambda t: status_msg.edit(t)))
+    start_download_task(task, StatusEditor(status_msg).set)
 
-@client.on(events.NewMessage(pattern=r"^(\d+(-\d+)?(,\d+(-\d+)?)*)$"))
+@client.on(events.NewMessage(pattern=EP_SPEC_RE))
 async def spec_reply_handler(event: events.NewMessage.Event) -> None:
     """
     Handle episode specification sent as a plain message.
 
-    If user sends just an episode spec and has a session stored in SESSION_STORE,
+    If user sends just an episode spec and has a session stored in Redis,
     interpret it as download request.
     """
     chat_id = event.chat_id
-    session_data = SESSION_STORE.get(chat_id)
+    session_data = await get_session(chat_id)
     if not session_data:
         # not in selection flow
         return
-    spec = event.raw_text.strip()
-    if not validate_episode_spec(spec):
-        await event.reply("Invalid episode spec. Examples: `1`, `1-3`, `1,3,5-7`.")
-        return
-    eps = session_data["available_episodes"]
+    # EP_SPEC_RE already matched the whole message, so the spec is valid
+    spec = event.pattern_match.group(0)
+    eps_by_num = session_data["episodes_by_num"]
     desired = expand_episode_spec_to_list(spec)
-    chosen = [ep for ep in eps if int(ep["episode"]) in desired]
+    chosen = [eps_by_num[n] for n in desired if n in eps_by_num]
     if not chosen:
         await event.reply("No matching episodes found in this anime for that spec.")
         return
     status_msg = await event.reply(f"Queued download for {session_data['anime_title']} episodes {spec}")
-    logger.info(f"chat_id {chat_id}, uploader_id {event.sender_id} ")
+    logger.info("chat_id %s, uploader_id %s", chat_id, event.sender_id)
     task = DownloadUploadTask(
         client,
         session_data["anime_title"],
@@ -324,9 +358,9 @@ async def spec_reply_handler(event: events.NewMessage.Event) -> None:
         quality=DEFAULT_QUALITY,
         audio=DEFAULT_AUDIO,
     )
-    asyncio.create_task(task.run(status_callback=lambda t: status_msg.edit(t)))
+    start_download_task(task, StatusEditor(status_msg).set)
 
-@client.on(events.NewMessage(pattern=r"^/get\s+(.+?)\s+(\d+)$"))
+@client.on(events.NewMessage(pattern=GET_RE))
 async def get_command(event: events.NewMessage.Event) -> None:
     """Handle the /get command to retrieve a cached episode."""
     anime = event.pattern_match.group(1).strip()
@@ -360,21 +394,9 @@ async def get_command(event: events.NewMessage.Event) -> None:
             logger.exception("fallback send_file failed")
             await event.reply(f"Could not send cached file: {exc2}")
 
-# @client.on(events.NewMessage(pattern=r"^/list\s+(.+)$"))
-# async def list_cmd(event: events.NewMessage.Event):
-#     anime = event.pattern_match.group(1).strip()
-#     rows = await list_uploaded_for_anime(anime)
-#     if not rows:
-#         await event.reply("No cached uploads found")
-#         return
-#     lines = [f"Ep {r.episode} — {r.filename} ({r.created_at})" for r in rows]
-#     msg = "\n".join(lines)
-#     if len(msg) > 4000:
-#         msg = msg[:3800] + "\n...truncated..."
-#     await event.reply(msg)
-
 async def main() -> None:
     """Main entry point for the bot application."""
+    configure_logging()
     await on_startup()
     loop = asyncio.get_event_loop()
     cleanup_task = loop.create_task(cleanup_loop(stop_event))
@@ -383,7 +405,13 @@ async def main() -> None:
     finally:
         stop_event.set()
         await cleanup_task
+        for running in _live_tasks:
+            running.cancel()
+        await asyncio.gather(*_live_tasks, return_exceptions=True)
+        await close_http_session()
+        shutdown_metadata_executor()
         await RedisClient.close()
+        stop_logging()
 
 # if __name__ == "__main__":
 #     asyncio.run(main())
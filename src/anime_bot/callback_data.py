@@ -0,0 +1,103 @@
+"""
+Inline button callback data for anime-bot.
+
+Callback payloads are packed as a 1-byte tag followed by a fixed-width
+integer or a length-prefixed UTF-8 string, which keeps them well inside
+Telegram's 64-byte callback_data limit. A single dispatcher routes each
+callback to the handler registered for its tag.
+"""
+import logging
+import struct
+from enum import IntEnum
+from typing import Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_TAG_INT = struct.Struct("!BI")
+
+CallbackHandler = Callable[..., Awaitable[None]]
+_handlers: Dict[int, CallbackHandler] = {}
+
+
+class CallbackTag(IntEnum):
+    """First byte of every callback payload."""
+
+    SELECT = 1
+    PICK_EP = 2
+    LIST_ALL = 3
+    SEND_SPEC = 4
+    LIST_BY_ID = 5
+    LIST_BY_TITLE = 6
+
+
+def pack_tag(tag: CallbackTag) -> bytes:
+    """Encode a payload that carries only its tag."""
+    return bytes((tag,))
+
+
+def pack_int(tag: CallbackTag, value: int) -> bytes:
+    """Encode a tag followed by an unsigned 32-bit integer."""
+    return _TAG_INT.pack(tag, value)
+
+
+def pack_str(tag: CallbackTag, *values: str) -> bytes:
+    """Encode a tag followed by one or more length-prefixed UTF-8 strings."""
+    out = bytearray((tag,))
+    for value in values:
+        raw = value.encode()
+        out.append(len(raw))
+        out += raw
+    return bytes(out)
+
+
+def unpack_int(data: bytes) -> int:
+    """Decode the integer of a pack_int payload."""
+    return _TAG_INT.unpack_from(data)[1]
+
+
+def unpack_strs(data: bytes) -> List[str]:
+    """Decode every string of a pack_str payload."""
+    values = []
+    pos = 1
+    while pos < len(data):
+        length = data[pos]
+        values.append(data[pos + 1 : pos + 1 + length].decode())
+        pos += 1 + length
+    return values
+
+
+def register_callback(tag: CallbackTag) -> Callable[[CallbackHandler], CallbackHandler]:
+    """Decorator registering a coroutine as the handler for a callback tag.
+
+    Args:
+        tag: The payload tag the handler serves.
+
+    Returns:
+        Decorator returning the handler unchanged.
+    """
+    def decorator(handler: CallbackHandler) -> CallbackHandler:
+        _handlers[tag] = handler
+        return handler
+
+    return decorator
+
+
+async def dispatch_callback(event) -> None:
+    """Route a callback query to the handler registered for its tag.
+
+    Buttons created before the binary format (or with unknown tags) are
+    answered as expired.
+
+    Args:
+        event: The Telethon CallbackQuery event.
+    """
+    data = event.data
+    handler = _handlers.get(data[0]) if data else None
+    if handler is None:
+        await event.answer("This button has expired. Please run the command again.", alert=True)
+        return
+    try:
+        await handler(event)
+    except (struct.error, IndexError, UnicodeDecodeError):
+        logger.warning("Malformed callback payload %r", data)
+        await event.answer("Invalid payload", alert=True)
@@ -8,8 +8,10 @@ import asyncio
 import logging
 import os
 import time
+from typing import Iterator, List, Tuple
 
 from .config import settings
+from .playlist_cache import prune_playlist_cache
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +19,65 @@ logger = logging.getLogger(__name__)
 CLEANUP_INTERVAL_SECONDS: int = 3600
 
 
+def _iter_files(root: str) -> Iterator[os.DirEntry]:
+    """Yield every regular file below root, without following symlinks."""
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def _archive_files(paths: List[str], archive_dir: str) -> None:
+    """Move files to the archive directory, deleting any that cannot be moved."""
+    for fpath in paths:
+        dest = os.path.join(archive_dir, os.path.basename(fpath))
+        try:
+            os.replace(fpath, dest)
+            logger.info("Moved %s to archive", fpath)
+        except Exception:
+            try:
+                os.remove(fpath)
+                logger.info("Deleted %s", fpath)
+            except Exception:
+                logger.exception("Failed to remove old file %s", fpath)
+
+
+def _sweep_once(download_dir: str, archive_dir: str, retention: int, now: float) -> Tuple[int, int]:
+    """Archive downloaded files older than the retention period.
+
+    Blocking; run it on a worker thread.
+
+    Args:
+        download_dir: Directory to scan recursively.
+        archive_dir: Directory expired files are moved into.
+        retention: Maximum file age in seconds.
+        now: Reference timestamp for file ages.
+
+    Returns:
+        Tuple of (files scanned, files expired).
+    """
+    scanned = 0
+    expired = []
+    for entry in _iter_files(download_dir):
+        scanned += 1
+        try:
+            # is_dir/is_file come from the scan itself; only this stat hits the disk
+            mtime = entry.stat(follow_symlinks=False).st_mtime
+        except OSError:
+            continue
+        if now - mtime >= retention:
+            expired.append(entry.path)
+    _archive_files(expired, archive_dir)
+    return scanned, len(expired)
+
+
 async def cleanup_loop(stop_event: asyncio.Event) -> None:
     """Background task that periodically cleans up old downloaded files.
 
     Moves files older than the retention period to the archive directory,
-    or deletes them if moving fails.
+    or deletes them if moving fails. Also prunes the playlist cache.
 
     Args:
         stop_event: Event to signal when the cleanup loop should stop.
@@ -32,29 +88,17 @@ async def cleanup_loop(stop_event: asyncio.Event) -> None:
     os.makedirs(archive_dir, exist_ok=True)
 
     while not stop_event.is_set():
-        now = time.time()
         try:
-            for root, _dirs, files in os.walk(download_dir):
-                for fname in files:
-                    fpath = os.path.join(root, fname)
-                    try:
-                        mtime = os.path.getmtime(fpath)
-                    except Exception:
-                        continue
-                    age = now - mtime
-                    if age >= settings.file_retention_seconds:
-                        dest = os.path.join(archive_dir, fname)
-                        try:
-                            os.replace(fpath, dest)
-                            logger.info("Moved %s to archive", fpath)
-                        except Exception:
-                            try:
-                                os.remove(fpath)
-                                logger.info("Deleted %s", fpath)
-                            except Exception:
-                                logger.exception("Failed to remove old file %s", fpath)
+            scanned, expired = await asyncio.to_thread(
+                _sweep_once, download_dir, archive_dir, settings.file_retention_seconds, time.time()
+            )
+            logger.debug("Cleanup scanned %d files, archived %d", scanned, expired)
         except Exception:
             logger.exception("Error during cleanup")
+        try:
+            await asyncio.to_thread(prune_playlist_cache)
+        except Exception:
+            logger.exception("Error pruning playlist cache")
         try:
             await asyncio.wait_for(stop_event.wait(), timeout=CLEANUP_INTERVAL_SECONDS)
         except asyncio.TimeoutError:
@@ -4,26 +4,83 @@ List command handler for anime-bot.
 Provides functionality to list uploaded anime episodes with fuzzy search
 and per-language breakdown.
 """
-import urllib
+import re
+import secrets
 from collections import defaultdict
-from typing import List
+from operator import attrgetter
+from typing import FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from telethon import Button, events
 
 from ..bot import client
-from ..db import list_uploaded_for_anime, list_distinct_anime_titles, get_uploaded_file_by_id
+from ..callback_data import (
+    CallbackTag,
+    pack_int,
+    pack_str,
+    register_callback,
+    unpack_int,
+    unpack_strs,
+)
+from ..config import settings
+from ..db import (
+    get_uploads_cached,
+    exact_title_exists,
+    get_cached_anime_titles,
+    summarize_uploads_for_titles,
+    get_uploaded_file_by_id,
+)
 from ..models import UploadedFile
-from ..utils import fuzzy_score
+from ..redis_client import RedisClient
+from ..utils import rank_titles, normalize_title, trigrams, join_until
 from ..constants import MAX_MESSAGE_LENGTH, TRUNCATED_MESSAGE_LENGTH
-from ..logging_config import configure_logging
 import logging
 
 # UI Constants for list command
 MAX_TITLE_BUTTON_LENGTH = 20
 MAX_SEARCH_RESULTS = 8
+# Rows fetched for an episode list; shared by /list and its buttons so both
+# hit the same cache entry
+LIST_EPISODES_LIMIT = 500
+
+# The captured query never has leading or trailing whitespace
+LIST_RE = re.compile(r"^/list\s+(\S(?:.*\S)?)\s*$")
 
 logger = logging.getLogger(__name__)
 
+# Normalized match keys and their trigrams for the last title list returned
+# by the DB cache; reused for as long as the cache hands back the same list.
+_norm_titles_source: Optional[List[str]] = None
+_norm_titles: List[str] = []
+_title_trigrams: List[FrozenSet[str]] = []
+
+
+async def _store_title_token(title: str) -> str:
+    """Store a title under a short random token for a LIST_BY_TITLE button.
+
+    The token keeps the payload a fixed 13 bytes however long the title is.
+
+    Args:
+        title: The anime title the button should open.
+
+    Returns:
+        The token to pack into the button.
+    """
+    token = secrets.token_urlsafe(9)
+    await RedisClient.set(
+        f"{settings.list_token_prefix}{token}", title, ex=settings.list_token_ttl_seconds
+    )
+    return token
+
+
+def _match_keys(titles: List[str]) -> Tuple[List[str], List[FrozenSet[str]]]:
+    """Return normalized titles and their trigrams, recomputed only when the title list changed."""
+    global _norm_titles_source, _norm_titles, _title_trigrams
+    if titles is not _norm_titles_source:
+        _norm_titles = [normalize_title(t) for t in titles]
+        _title_trigrams = [trigrams(t) for t in _norm_titles]
+        _norm_titles_source = titles
+    return _norm_titles, _title_trigrams
+
 def format_file_size(size_bytes: int | None) -> str:
     """Format file size in human-readable format.
 
@@ -57,11 +114,11 @@ def truncate_title(title: str, max_length: int = MAX_TITLE_BUTTON_LENGTH) -> str
     return title[: max_length - 6] + "…"
 
 
-def build_episode_summary(rows: List[UploadedFile]) -> dict:
+def build_episode_summary(rows: Sequence[UploadedFile]) -> dict:
     """Build a summary of episodes from database rows.
 
     Args:
-        rows: List of UploadedFile records.
+        rows: UploadedFile records or db.get_uploads_cached rows.
 
     Returns:
         Dictionary with episode counts, language breakdown, and quality info.
@@ -90,25 +147,53 @@ def build_episode_summary(rows: List[UploadedFile]) -> dict:
     }
 
 
-def format_episode_line(row: UploadedFile, index: int) -> str:
-    """Format a single episode line for display.
+def summary_from_aggregate(agg: Optional[dict]) -> dict:
+    """Convert a db.summarize_uploads_for_titles entry to the build_episode_summary shape.
 
     Args:
-        row: The UploadedFile record.
-        index: Line index for alternating formatting.
+        agg: Aggregate for one title, or None if the title has no uploads.
 
     Returns:
-        Formatted string for the episode.
+        Dictionary with episode counts, language breakdown, and quality info.
     """
-    lang = row.ep_lang.upper() if row.ep_lang else "?"
-    qual = f"{row.ep_qual}p" if row.ep_qual else "?"
-    size = format_file_size(row.filesize)
-    date = row.created_at.strftime("%Y-%m-%d") if row.created_at else "?"
+    if not agg:
+        return build_episode_summary([])
+    lang_counts = defaultdict(int)
+    for lang, count in agg["languages"].items():
+        if lang:
+            lang_counts[lang.upper()] += count
+    quality_counts = {f"{qual}p": count for qual, count in agg["qualities"].items() if qual}
+    return {
+        "total_episodes": agg["total_episodes"],
+        "episode_range": f"{agg['min_episode']}-{agg['max_episode']}",
+        "languages": dict(lang_counts),
+        "qualities": quality_counts,
+        "total_size": agg["total_size"],
+        "file_count": agg["file_count"],
+    }
+
+
+_episode_fields = attrgetter("episode", "ep_lang", "ep_qual", "filesize", "created_at")
+
+
+def format_episode_lines(rows: Iterable[UploadedFile]) -> Iterator[str]:
+    """Format episode lines for display, one per row.
+
+    Args:
+        rows: UploadedFile records or db.get_uploads_cached rows.
 
-    return f"📺 Ep {row.episode:02d} │ {lang} │ {qual} │ {size} │ {date}"
+    Yields:
+        Formatted string for each episode.
+    """
+    for episode, lang, qual, filesize, created_at in map(_episode_fields, rows):
+        yield (
+            f"📺 Ep {episode:02d} │ {lang.upper() if lang else '?'} │ "
+            f"{f'{qual}p' if qual else '?'} │ {format_file_size(filesize)} │ "
+            f"{created_at.date().isoformat() if created_at else '?'}"
+        )
 
 
-@client.on(events.NewMessage(pattern=r"^/list\s+(.+)$"))
+@client.on(events.NewMessage(pattern=LIST_RE))
 async def list_command(event: events.NewMessage.Event) -> None:
     """Handle the /list command to show uploaded episodes.
 
@@ -118,40 +203,42 @@ async def list_command(event: events.NewMessage.Event) -> None:
       - Present grouped summary (title, total episodes, per-language counts)
       - Provide inline button to view full uploads for a chosen title
     """
-    query = event.pattern_match.group(1).strip()
+    query = event.pattern_match.group(1)
 
-    # Try exact match first
-    rows = await list_uploaded_for_anime(query, limit=200)
+    # Try exact match first; a cheap existence probe keeps misses from
+    # loading full rows before falling through to fuzzy search
+    rows = None
+    if await exact_title_exists(query):
+        rows = await get_uploads_cached(query, limit=LIST_EPISODES_LIMIT)
     if rows:
         # Exact match found — show detailed list directly
         await _send_episode_list(event, query, rows, is_callback=False)
         return
 
     # Fuzzy search over distinct titles
-    titles = await list_distinct_anime_titles()
-    scored = []
-    for title in titles:
-        score = fuzzy_score(title, query)
-        if score > 0:
-            scored.append((score, title))
-
-    if not scored:
+    titles = await get_cached_anime_titles()
+    norm_titles, title_trigrams = _match_keys(titles)
+    top = rank_titles(
+        titles, query, MAX_SEARCH_RESULTS, norm_titles=norm_titles, title_trigrams=title_trigrams
+    )
+
+    if not top:
         await event.reply(
             f"❌ No cached uploads matching `{query}`.\n\n"
             "💡 Try a different search term or check spelling."
         )
         return
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = [title for _, title in scored[:MAX_SEARCH_RESULTS]]
+    # Counts are aggregated in the database for all top titles at once
+    aggregates = await summarize_uploads_for_titles(top)
 
     # Build summary and buttons for each result
     buttons = []
     summary_lines = ["🔍 **Search Results**\n"]
 
     for idx, title in enumerate(top, 1):
-        rows = await list_uploaded_for_anime(title, limit=1000)
-        summary = build_episode_summary(rows)
+        agg = aggregates.get(title)
+        summary = summary_from_aggregate(agg)
 
         # Format language info
         if summary["languages"]:
@@ -176,12 +263,12 @@ async def list_command(event: events.NewMessage.Event) -> None:
 
         # Create button with truncated title and include a representative id
         button_label = f"📋 {truncate_title(title)}"
-        rep_id = rows[0].id if rows else None
+        rep_id = agg["rep_id"] if agg else None
         if rep_id is None:
-            payload = f"LIST_BY_TITLE|{urllib.parse.quote_plus(title)}"
+            payload = pack_str(CallbackTag.LIST_BY_TITLE, await _store_title_token(title))
         else:
-            payload = f"LIST_BY_ID|{rep_id}"
-        buttons.append([Button.inline(button_label, payload.encode())])
+            payload = pack_int(CallbackTag.LIST_BY_ID, rep_id)
+        buttons.append([Button.inline(button_label, payload)])
 
     msg = "\n".join(summary_lines)
     if len(msg) > MAX_MESSAGE_LENGTH:
@@ -191,14 +278,14 @@ async def list_command(event: events.NewMessage.Event) -> None:
 
 
 async def _send_episode_list(
-    event, title: str, rows: List[UploadedFile], is_callback: bool = False
+    event, title: str, rows: Sequence[UploadedFile], is_callback: bool = False
 ) -> None:
     """Send formatted episode list to user.
 
     Args:
         event: The Telegram event.
         title: Anime title.
-        rows: List of UploadedFile records.
+        rows: UploadedFile records or db.get_uploads_cached rows.
         is_callback: Whether this is from a callback (edit) or new message (reply).
     """
     summary = build_episode_summary(rows)
@@ -212,21 +299,15 @@ async def _send_episode_list(
         "─" * 30,
     ]
 
-    # Build episode list
-    episode_lines = []
-    for idx, row in enumerate(rows):
-        episode_lines.append(format_episode_line(row, idx))
-
-    full_msg = "\n".join(header_lines) + "\n" + "\n".join(episode_lines)
-
-    if len(full_msg) > MAX_MESSAGE_LENGTH:
-        # Truncate episode list but keep header
-        header = "\n".join(header_lines)
-        remaining = MAX_MESSAGE_LENGTH - len(header) - 50
-        episode_text = "\n".join(episode_lines)
-        if len(episode_text) > remaining:
-            episode_text = episode_text[:remaining] + "\n\n⚠️ ...list truncated..."
-        full_msg = header + "\n" + episode_text
+    # Format only as many episode lines as fit next to the header
+    header = "\n".join(header_lines)
+    episode_text = join_until(
+        format_episode_lines(rows),
+        "\n",
+        MAX_MESSAGE_LENGTH - len(header) - 1,
+        suffix="\n\n⚠️ ...list truncated...",
+    )
+    full_msg = header + "\n" + episode_text
 
     if is_callback:
         try:
@@ -237,24 +318,13 @@ async def _send_episode_list(
         await event.reply(full_msg, parse_mode="md")
 
 
-@client.on(events.CallbackQuery(pattern=b"LIST_BY_ID"))
+@register_callback(CallbackTag.LIST_BY_ID)
 async def list_by_id_callback(event: events.CallbackQuery.Event) -> None:
     """Handle callback when user presses a fuzzy-search result button.
 
-    Payload format: LIST_BY_ID|<uploaded_file_id>
+    Payload: pack_int(CallbackTag.LIST_BY_ID, <uploaded_file_id>)
     """
-    data = event.data.decode()
-    try:
-        _, enc = data.split("|", 1)
-    except ValueError:
-        await event.answer("Invalid payload", alert=True)
-        return
-
-    try:
-        file_id = int(enc)
-    except ValueError:
-        await event.answer("Invalid id", alert=True)
-        return
+    file_id = unpack_int(event.data)
 
     rep = await get_uploaded_file_by_id(file_id)
     if not rep:
@@ -262,11 +332,32 @@ async def list_by_id_callback(event: events.CallbackQuery.Event) -> None:
         return
 
     title = rep.anime_title
-    rows = await list_uploaded_for_anime(title, limit=500)
+    rows = await get_uploads_cached(title, limit=LIST_EPISODES_LIMIT)
+
+    if not rows:
+        await event.answer(f"No cached uploads found for {title}.", alert=True)
+        return
+
+    await event.answer("Loading episodes...")
+    await _send_episode_list(event, title, rows, is_callback=True)
+
+
+@register_callback(CallbackTag.LIST_BY_TITLE)
+async def list_by_title_callback(event: events.CallbackQuery.Event) -> None:
+    """Handle a fuzzy-search result button that refers to a stored title.
+
+    Payload: pack_str(CallbackTag.LIST_BY_TITLE, <title token>)
+    """
+    (token,) = unpack_strs(event.data)
+    title = await RedisClient.get(f"{settings.list_token_prefix}{token}")
+    if not title:
+        await event.answer("This button has expired. Please run /list again.", alert=True)
+        return
 
+    rows = await get_uploads_cached(title, limit=LIST_EPISODES_LIMIT)
     if not rows:
         await event.answer(f"No cached uploads found for {title}.", alert=True)
         return
 
     await event.answer("Loading episodes...")
-    await _send_episode_list(event, title, rows, is_callback=True)
\ No newline at end of file
+    await _send_episode_list(event, title, rows, is_callback=True)
@@ -3,12 +3,16 @@ Ping command handler for anime-bot.
 
 Provides a simple health check command to verify the bot is responsive.
 """
+import re
+
 from telethon import events
 
 from ..bot import client
 
+PING_RE = re.compile(r"^/ping")
+
 
-@client.on(events.NewMessage(pattern=r"^/ping"))
+@client.on(events.NewMessage(pattern=PING_RE))
 async def ping_handler(event: events.NewMessage.Event) -> None:
     """Handle the /ping command to check bot responsiveness."""
     await event.reply("PONG")
\ No newline at end of file
@@ -4,16 +4,35 @@ Start command for the anime bot.
 Handles the /start command to welcome users.
 """
 
+import re
+
 from telethon import events
 
 from ..bot import client
 from ..config import settings
-from redis.asyncio import Redis
+from redis.exceptions import ResponseError
 from ..redis_client import RedisClient
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Connect tokens are a single whitespace-free word
+START_RE = re.compile(r"^/start(?:\s+(\S+))?\s*$")
+
+
+async def _swap_token(key: str, value: str) -> str | None:
+    """Atomically replace the value at key and return the previous one.
+
+    Uses SET ... GET (Redis >= 6.2); older servers reject the GET option,
+    in which case a MULTI/EXEC pipeline of GET + SET is used instead.
+    """
+    try:
+        return await RedisClient.set(key, value, get=True)
+    except ResponseError:
+        async with RedisClient.pipeline(transaction=True) as pipe:
+            old, _ = await pipe.get(key).set(key, value).execute()
+        return old
+
 async def consume_connect_token(token: str, user_id: str) -> str | None:
     """
     Atomically consume a connection token and return the session ID.
@@ -23,18 +42,17 @@ async def consume_connect_token(token: str, user_id: str) -> str | None:
     key = f"{settings.token_prefix}{token}"
     
     try:
-        logger.info(f"Searching for key: {key} to link user_id {user_id}")
-        saved_token_id = await RedisClient.get(key)
+        logger.info("Searching for key: %s to link user_id %s", key, user_id)
+        saved_token_id = await _swap_token(key, user_id)
         if not saved_token_id:
             # Token is not updated yet
-            logger.info(f"Token {token} not found, set user_id {user_id} for future consumption.")
-        await RedisClient.set(key, user_id)
-        logger.info(f"Token {token} consumed, linked to user_id {user_id}.")
+            logger.info("Token %s not found, set user_id %s for future consumption.", token, user_id)
+        logger.info("Token %s consumed, linked to user_id %s.", token, user_id)
         return saved_token_id
-    except Redis.ResponseError:
+    except ResponseError:
         return None
 
-@client.on(events.NewMessage(pattern=r"^/start(?:\s+(.+))?"))
+@client.on(events.NewMessage(pattern=START_RE))
 async def start_handler(event: events.NewMessage.Event) -> None:
     """
     Handle the /start command.
@@ -46,7 +64,7 @@ async def start_handler(event: events.NewMessage.Event) -> None:
 
     # Extract token from command arguments
     match = event.pattern_match
-    token = match.group(1).strip() if match.group(1) else None
+    token = match.group(1)
 
     if not token:
         # No token provided - just a regular /start command
@@ -57,7 +75,7 @@ async def start_handler(event: events.NewMessage.Event) -> None:
         return
     
     # Token provided - link browser session
-    logger.info(f"Linking browser session for chat_id={chat_id} with token={token}")
+    logger.info("Linking browser session for chat_id=%s with token=%s", chat_id, token)
 
     try:
         saved_token_id = await consume_connect_token(token, user_id=str(chat_id))
@@ -74,7 +92,7 @@ async def start_handler(event: events.NewMessage.Event) -> None:
             "You can now receive download links and notifications here."
         )
     except Exception as e:
-        logger.exception(f"Error linking start token: {e}")
+        logger.exception("Error linking start token: %s", e)
         await event.respond(
             "⚠️ **Connection Failed**\n\n"
             "An unexpected error occurred while linking your Telegram.\n"
@@ -4,7 +4,6 @@ Configuration module for anime-bot.
 Uses pydantic-settings for environment variable loading and validation.
 All settings can be configured via environment variables or a .env file.
 """
-from pydantic_settings import BaseSettings
 from src.config import CommonSettings
 
 
@@ -22,14 +21,24 @@ class Settings(CommonSettings):
     # File storage paths
     download_dir: str = "./data/downloads"
     archive_dir: str = "./data/archive"
+    playlist_cache_dir: str = "./data/playlist_cache"
+    # Per-episode scratch space; empty means /dev/shm when writable, else the
+    # system temp dir. Falls back to the temp dir when free space runs low.
+    scratch_dir: str = ""
+    scratch_min_free_bytes: int = 2 * 1024 * 1024 * 1024
 
     # Concurrency settings
-    max_upload_concurrency: int = 2
+    # Uploads across all chats, and into any single chat
+    max_upload_concurrency: int = 4
+    max_upload_per_chat: int = 2
     download_workers: int = 2
+    max_metadata_concurrency: int = 8
 
     # File management
     file_retention_seconds: int = 7 * 24 * 3600
     delete_after_upload: bool = True
+    playlist_cache_ttl_seconds: int = 3600
+    playlist_cache_max_bytes: int = 50 * 1024 * 1024
 
     # Rate limiting
     rate_limit_seconds: float = 1.0
@@ -46,6 +55,14 @@ class Settings(CommonSettings):
     # PREFIX for start bot command
     token_prefix: str = "connect:token:"
     session_chat_prefix: str = "session:chat:"
+    # Seconds a chat's anime selection stays in Redis after /search
+    session_ttl_seconds: int = 1800
+    # /list buttons that cannot carry a row id point at a title stored here
+    list_token_prefix: str = "list:title:"
+    list_token_ttl_seconds: int = 600
+    # Parsed episode-page streams, keyed by episode session
+    stream_cache_prefix: str = "streams:"
+    stream_cache_ttl_seconds: int = 3600
 
     # Inherit model_config from CommonSettings; no extra Config class needed
 
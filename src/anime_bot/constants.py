@@ -15,19 +15,54 @@ MAX_MESSAGE_LENGTH: int = 4000
 TRUNCATED_MESSAGE_LENGTH: int = 3800
 MAX_EPISODE_LIST_LENGTH: int = 3000
 TRUNCATED_EPISODE_LIST_LENGTH: int = 2900
+MAX_CALLBACK_DATA_BYTES: int = 64  # Telegram limit for inline button data
 
 # Download/Upload Constants
 DEFAULT_QUALITY: str = "360"
 DEFAULT_AUDIO: str = "jpn"
 DEFAULT_NUM_THREADS: int = 50
 PROGRESS_UPDATE_INTERVAL: int = 5  # seconds
+STATUS_EDIT_INTERVAL: float = 1.5  # min seconds between status message edits
+SEGMENT_FETCH_RETRIES: int = 3  # attempts per HLS segment before giving up
+SEGMENT_FETCH_TIMEOUT: int = 60  # seconds per HLS segment request
+UPLOAD_PART_SIZE_KB: int = 512  # Telegram's largest upload part; fewer reads and requests per file
+
+# HTTP Connection Pool Constants
+HTTP_POOL_LIMIT: int = 200
+HTTP_POOL_LIMIT_PER_HOST: int = 32
+HTTP_DNS_CACHE_TTL: int = 300  # seconds
+
+# Redis Connection Pool Constants
+REDIS_MAX_CONNECTIONS: int = 64
+REDIS_HEALTH_CHECK_INTERVAL: int = 30  # seconds
 
 # Database Constants
 DEFAULT_QUERY_LIMIT: int = 50
 EXTENDED_QUERY_LIMIT: int = 200
 MAX_QUERY_LIMIT: int = 1000
 
+# Cache Constants
+ANIME_LIST_TTL_SECONDS: int = 300
+PLAYLIST_FILENAME: str = "playlist.m3u8"
+TITLES_CACHE_TTL_SECONDS: int = 60
+UPLOADS_CACHE_TTL_SECONDS: int = 120
+UPLOADS_CACHE_MAX_ENTRIES: int = 256
+
+# Applied to every new SQLite connection: WAL lets /list reads run alongside
+# the upload writer, and mmap/cache keep hot pages out of read() syscalls.
+SQLITE_PRAGMAS: tuple = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "busy_timeout=5000",
+    "mmap_size=268435456",
+    "cache_size=-20000",
+    "temp_store=MEMORY",
+)
+
 # Fuzzy Search Scoring
 EXACT_MATCH_SCORE: int = 1000
 POSITION_PENALTY: int = 2
 CHAR_MATCH_SCORE: int = 10
+FUZZY_SCORE_CUTOFF: int = 50  # minimum RapidFuzz WRatio (0-100) to keep a match
+TRIGRAM_MIN_QUERY_LENGTH: int = 4  # shorter queries skip the trigram prefilter
+TRIGRAM_MIN_SHARED: int = 2  # trigrams a title must share with the query to be scored
@@ -6,19 +6,48 @@ retrieving uploaded file records.
 """
 import logging
 import os
+import time
+from collections import OrderedDict
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import defer
+from sqlalchemy import event, select, func, distinct, literal, Row
+from typing import Optional, List, Sequence, Dict, Any, Tuple
 
 from .config import settings
+from .constants import (
+    TITLES_CACHE_TTL_SECONDS,
+    UPLOADS_CACHE_TTL_SECONDS,
+    UPLOADS_CACHE_MAX_ENTRIES,
+    SQLITE_PRAGMAS,
+)
 from .models import Base, UploadedFile, Anime
 
 logger = logging.getLogger(__name__)
 
 engine = create_async_engine(settings.database_url, future=True, echo=False)
-AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+if settings.database_url.startswith("sqlite"):
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        """Apply SQLITE_PRAGMAS to each new SQLite connection."""
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+# Used where ORM objects are written or returned; pure reads go through
+# engine.connect() and skip the session's identity map and flush machinery.
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+# Distinct uploaded titles, cached for /list and dropped on every new upload
+_titles_cache: Optional[List[str]] = None
+_titles_cache_expires_at: float = 0.0
+
+# Recent list_uploaded_summary_for_anime results: (title, limit) ->
+# (expires_at, rows), least recently used first. Also dropped on every new upload.
+_uploads_cache: "OrderedDict[Tuple[str, int], Tuple[float, Sequence[Row]]]" = OrderedDict()
 
 
 async def init_db() -> None:
@@ -91,10 +120,12 @@ async def insert_uploaded_file(
         session.add(obj)
         await session.commit()
         await session.refresh(obj)
+        invalidate_titles_cache()
+        _uploads_cache.clear()
         return obj
 
 
-async def get_latest_uploaded(anime_title: str, episode: int) -> Optional[UploadedFile]:
+async def get_latest_uploaded(anime_title: str, episode: int) -> Optional[Row]:
     """Get the most recently uploaded file for a specific anime episode.
 
     Args:
@@ -102,20 +133,21 @@ async def get_latest_uploaded(anime_title: str, episode: int) -> Optional[Upload
         episode: The episode number.
 
     Returns:
-        The UploadedFile object if found, None otherwise.
+        A Row with every uploaded_files column (attribute access like
+        UploadedFile) if found, None otherwise.
     """
-    async with AsyncSessionLocal() as session:
+    async with engine.connect() as conn:
         query = (
-            select(UploadedFile)
+            select(UploadedFile.__table__)
             .where(UploadedFile.anime_title == anime_title, UploadedFile.episode == episode)
             .order_by(UploadedFile.created_at.desc())
             .limit(1)
         )
-        res = await session.execute(query)
-        return res.scalar_one_or_none()
+        res = await conn.execute(query)
+        return res.first()
 
 
-async def list_uploaded_for_anime(anime_title: str, limit: int = 50) -> List[UploadedFile]:
+async def list_uploaded_for_anime(anime_title: str, limit: int = 50) -> Sequence[Row]:
     """List all uploaded files for a specific anime.
 
     Args:
@@ -123,17 +155,91 @@ async def list_uploaded_for_anime(anime_title: str, limit: int = 50) -> List[Upl
         limit: Maximum number of results to return (default: 50).
 
     Returns:
-        List of UploadedFile objects.
+        Sequence of Rows with every uploaded_files column, ordered by episode.
     """
-    async with AsyncSessionLocal() as session:
+    async with engine.connect() as conn:
         query = (
-            select(UploadedFile)
+            select(UploadedFile.__table__)
             .where(UploadedFile.anime_title == anime_title)
             .order_by(UploadedFile.episode.asc())
             .limit(limit)
         )
-        res = await session.execute(query)
-        return res.scalars().all()
+        res = await conn.execute(query)
+        return res.all()
+
+
+async def list_uploaded_summary_for_anime(anime_title: str, limit: int = 50) -> Sequence[Row]:
+    """List the display columns of the uploaded files for a specific anime.
+
+    Only episode, ep_lang, ep_qual, filesize and created_at are selected, so
+    no ORM objects are built. Rows support
+    attribute access like UploadedFile (row.episode, row.filesize, ...).
+
+    Args:
+        anime_title: The title of the anime.
+        limit: Maximum number of results to return (default: 50).
+
+    Returns:
+        Sequence of Row tuples ordered by episode.
+    """
+    async with engine.connect() as conn:
+        query = (
+            select(
+                UploadedFile.episode,
+                UploadedFile.ep_lang,
+                UploadedFile.ep_qual,
+                UploadedFile.filesize,
+                UploadedFile.created_at,
+            )
+            .where(UploadedFile.anime_title == anime_title)
+            .order_by(UploadedFile.episode.asc())
+            .limit(limit)
+        )
+        res = await conn.execute(query)
+        return res.all()
+
+
+async def exact_title_exists(anime_title: str) -> bool:
+    """Check whether any upload exists for an exact anime title.
+
+    Args:
+        anime_title: The title of the anime.
+
+    Returns:
+        True if at least one UploadedFile has this title.
+    """
+    async with engine.connect() as conn:
+        query = select(literal(1)).where(UploadedFile.anime_title == anime_title).limit(1)
+        res = await conn.execute(query)
+        return res.first() is not None
+
+
+async def get_uploads_cached(anime_title: str, limit: int = 50) -> Sequence[Row]:
+    """list_uploaded_summary_for_anime, served from a short-lived LRU cache.
+
+    Lets the /list reply and the button press that follows it share one
+    query. Entries expire after UPLOADS_CACHE_TTL_SECONDS or when a new
+    file is uploaded.
+
+    Args:
+        anime_title: The title of the anime.
+        limit: Maximum number of results to return (default: 50).
+
+    Returns:
+        Sequence of display-column rows. Callers must not mutate it.
+    """
+    key = (anime_title, limit)
+    now = time.monotonic()
+    hit = _uploads_cache.get(key)
+    if hit is not None and now < hit[0]:
+        _uploads_cache.move_to_end(key)
+        return hit[1]
+    rows = await list_uploaded_summary_for_anime(anime_title, limit=limit)
+    _uploads_cache[key] = (now + UPLOADS_CACHE_TTL_SECONDS, rows)
+    _uploads_cache.move_to_end(key)
+    while len(_uploads_cache) > UPLOADS_CACHE_MAX_ENTRIES:
+        _uploads_cache.popitem(last=False)
+    return rows
 
 
 async def list_distinct_anime_titles() -> List[str]:
@@ -142,10 +248,88 @@ async def list_distinct_anime_titles() -> List[str]:
     Returns:
         List of unique anime titles.
     """
-    async with AsyncSessionLocal() as session:
+    async with engine.connect() as conn:
         query = select(UploadedFile.anime_title).distinct()
-        res = await session.execute(query)
-        return [r[0] for r in res.fetchall()]
+        res = await conn.execute(query)
+        return list(res.scalars())
+
+
+async def get_cached_anime_titles() -> List[str]:
+    """Get the distinct anime titles, served from a short-lived cache.
+
+    Returns:
+        List of unique anime titles. Callers must not mutate it.
+    """
+    global _titles_cache, _titles_cache_expires_at
+    if _titles_cache is None or time.monotonic() >= _titles_cache_expires_at:
+        _titles_cache = await list_distinct_anime_titles()
+        _titles_cache_expires_at = time.monotonic() + TITLES_CACHE_TTL_SECONDS
+    return _titles_cache
+
+
+def invalidate_titles_cache() -> None:
+    """Drop the cached distinct titles so the next lookup hits the database."""
+    global _titles_cache
+    _titles_cache = None
+
+
+async def summarize_uploads_for_titles(anime_titles: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """Aggregate upload statistics for several anime in the database.
+
+    Args:
+        anime_titles: The anime titles to summarize.
+
+    Returns:
+        Dict keyed by title (titles without uploads are absent). Each value
+        has total_episodes, min_episode, max_episode, file_count, total_size,
+        rep_id (lowest row id of the title), plus languages and qualities
+        mapping each ep_lang / ep_qual to its file count.
+    """
+    if not anime_titles:
+        return {}
+    in_titles = UploadedFile.anime_title.in_(anime_titles)
+    async with engine.connect() as conn:
+        totals = await conn.execute(
+            select(
+                UploadedFile.anime_title,
+                func.count(distinct(UploadedFile.episode)),
+                func.min(UploadedFile.episode),
+                func.max(UploadedFile.episode),
+                func.count(),
+                func.sum(UploadedFile.filesize),
+                func.min(UploadedFile.id),
+            )
+            .where(in_titles)
+            .group_by(UploadedFile.anime_title)
+        )
+        breakdown = await conn.execute(
+            select(
+                UploadedFile.anime_title,
+                UploadedFile.ep_lang,
+                UploadedFile.ep_qual,
+                func.count(),
+            )
+            .where(in_titles)
+            .group_by(UploadedFile.anime_title, UploadedFile.ep_lang, UploadedFile.ep_qual)
+        )
+
+    summaries: Dict[str, Dict[str, Any]] = {}
+    for title, episodes, min_ep, max_ep, file_count, total_size, rep_id in totals:
+        summaries[title] = {
+            "total_episodes": episodes,
+            "min_episode": min_ep,
+            "max_episode": max_ep,
+            "file_count": file_count,
+            "total_size": total_size or 0,
+            "rep_id": rep_id,
+            "languages": {},
+            "qualities": {},
+        }
+    for title, lang, qual, count in breakdown:
+        summary = summaries[title]
+        summary["languages"][lang] = summary["languages"].get(lang, 0) + count
+        summary["qualities"][qual] = summary["qualities"].get(qual, 0) + count
+    return summaries
 
 
 async def get_uploaded_file_by_id(file_id: int) -> Optional[UploadedFile]:
@@ -155,9 +339,15 @@ async def get_uploaded_file_by_id(file_id: int) -> Optional[UploadedFile]:
         file_id: Primary key id of the UploadedFile.
 
     Returns:
-        UploadedFile instance or None if not found.
+        UploadedFile instance or None if not found. filename is not loaded;
+        accessing it raises instead of lazy-loading.
     """
     async with AsyncSessionLocal() as session:
-        query = select(UploadedFile).where(UploadedFile.id == file_id).limit(1)
+        query = (
+            select(UploadedFile)
+            .options(defer(UploadedFile.filename, raiseload=True))
+            .where(UploadedFile.id == file_id)
+            .limit(1)
+        )
         res = await session.execute(query)
         return res.scalar_one_or_none()
\ No newline at end of file
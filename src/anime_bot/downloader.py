@@ -5,30 +5,119 @@ This module provides functionality to download anime episodes from AnimePahe,
 including stream selection, playlist downloading, and video compilation.
 """
 import asyncio
+import bisect
+import functools
 import logging
 import os
 import shutil
 import tempfile
-from typing import Optional, List, Dict, Any
+from operator import attrgetter
+from typing import Optional, List, Dict, NamedTuple, Tuple
 
-from bs4 import BeautifulSoup
+import orjson
 from anime_downloader.utils import constants as AnimepaheConfig
+from redis.exceptions import RedisError
 
 from .anime_api import AnimePaheClient
 from .config import settings
 from .constants import DEFAULT_NUM_THREADS
-from .logging_config import configure_logging
-
-# configure_logging()
+from .hls import download_segments, remux_playlist
+from .redis_client import RedisClient
 
 logger = logging.getLogger(__name__)
 
-# try to import the async helper if available
+# selectolax's lexbor engine parses episode pages far faster than bs4; fall
+# back to BeautifulSoup when it is not installed
 try:
-    # from anime_downloader.async_downloader import download_episode_async
-    download_episode_async = None
-except Exception:
-    download_episode_async = None
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+    from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+    # Only stream buttons are materialised when falling back to bs4
+    _STREAM_BUTTON_STRAINER = SoupStrainer("button", attrs={"data-src": True, "data-av1": "0"})
+
+STREAM_BUTTON_SELECTOR = 'button[data-src][data-av1="0"]'
+
+
+def _stream_button_attrs(html) -> List[Dict[str, Optional[str]]]:
+    """Return the attribute dicts of the non-AV1 stream buttons on an episode page.
+
+    Args:
+        html: Episode page body (str or bytes).
+
+    Returns:
+        One attribute dict per matching <button>.
+    """
+    if LexborHTMLParser is not None:
+        return [node.attributes for node in LexborHTMLParser(html).css(STREAM_BUTTON_SELECTOR)]
+    try:
+        soup = BeautifulSoup(html, "lxml", parse_only=_STREAM_BUTTON_STRAINER)
+    except FeatureNotFound:
+        soup = BeautifulSoup(html, "html.parser", parse_only=_STREAM_BUTTON_STRAINER)
+    return [btn.attrs for btn in soup.find_all("button")]
+
+class StreamInfo(NamedTuple):
+    """One stream offered on an episode page.
+
+    Attributes:
+        quality: Vertical resolution (e.g. 720), 0 if missing or malformed.
+        audio: Audio language code, or None.
+        url: Stream page URL, or None.
+    """
+
+    quality: int
+    audio: Optional[str]
+    url: Optional[str]
+
+
+_stream_quality = attrgetter("quality")
+
+@functools.lru_cache(maxsize=64)
+def _select_stream(
+    streams: Tuple[StreamInfo, ...], target_quality: int, audio: str
+) -> StreamInfo:
+    """Pick the stream to download for a quality and audio preference.
+
+    Streams in the preferred audio are used when there are any, otherwise
+    all streams. Among those (sorted by quality) the first at or above
+    target_quality wins, else the best available. Pure and memoized, so
+    retries of an episode with its cached stream list skip the selection.
+
+    Args:
+        streams: Non-empty streams sorted by quality ascending.
+        target_quality: Requested vertical resolution.
+        audio: Preferred audio language.
+
+    Returns:
+        The selected stream.
+    """
+    candidates = [s for s in streams if s.audio == audio] or streams
+    idx = bisect.bisect_left(candidates, target_quality, key=_stream_quality)
+    return candidates[idx] if idx < len(candidates) else candidates[-1]
+
+
+# Shared by every AnimeDownloaderService so the AnimePahe HTTP session (and
+# its keep-alive connections, TLS sessions and clearance cookies) outlives
+# a single download task
+_client: Optional[AnimePaheClient] = None
+
+
+def _get_client() -> AnimePaheClient:
+    """Return the process-wide download client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = AnimePaheClient(verify_ssl=True)
+    return _client
+
+
+def _safe_int(value: Optional[str]) -> int:
+    """Parse a resolution attribute, returning 0 if it is missing or malformed."""
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
+
 
 class EpisodeDownloadResult:
     """Result of an episode download operation.
@@ -42,6 +131,8 @@ class EpisodeDownloadResult:
         reason: Reason for failure (if applicable).
     """
 
+    __slots__ = ("episode", "episode_qual", "episode_lang", "filepath", "success", "reason")
+
     def __init__(
         self,
         episode_number: int,
@@ -68,62 +159,78 @@ class AnimeDownloaderService:
 
     def __init__(self) -> None:
         """Initialize the downloader service."""
-        self.client = AnimePaheClient(verify_ssl=True)
+        self.client = _get_client()
         os.makedirs(settings.download_dir, exist_ok=True)
+        self._scratch_root = settings.scratch_dir or (
+            "/dev/shm" if os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+        )
+
+    def _scratch_dir(self) -> str:
+        """Return the scratch root if it has room for an episode, else the temp dir."""
+        try:
+            if shutil.disk_usage(self._scratch_root).free >= settings.scratch_min_free_bytes:
+                return self._scratch_root
+        except OSError:
+            pass
+        return tempfile.gettempdir()
 
     async def get_stream_qualities(
         self, anime_slug: str, ep_session: str
-    ) -> Optional[List[Dict[str, Any]]]:
+    ) -> Optional[List[StreamInfo]]:
         """Fetch available stream qualities for an episode.
 
         Patch of the animepahe-dl library to fetch URLs for all episode qualities.
+        The parsed list is cached in Redis per episode session, so retries and
+        re-downloads skip the page fetch.
 
         Args:
             anime_slug: The anime session/slug identifier.
             ep_session: The episode session identifier.
 
         Returns:
-            List of stream dicts with quality, audio, and url, or None if failed.
+            Streams sorted by quality ascending, or None if failed.
         """
+        cache_key = f"{settings.stream_cache_prefix}{ep_session}"
+        try:
+            cached = await RedisClient.get(cache_key)
+        except RedisError:
+            logger.warning("Stream cache lookup failed for %s", ep_session, exc_info=True)
+            cached = None
+        if cached:
+            return [StreamInfo(*s) for s in orjson.loads(cached)]
+
         play_url = f"{AnimepaheConfig.PLAY_URL}/{anime_slug}/{ep_session}"
         response = self.client._api._request(play_url)
         if not response:
             logger.error("Failed to get episode page.")
             return None
-        soup = BeautifulSoup(response.data, "html.parser")
-        buttons = soup.find_all("button", attrs={"data-src": True, "data-av1": "0"})
-
-        # Extract only the primitive values we need into plain Python dicts
-        streams: List[Dict[str, Any]] = []
-        for btn in buttons:
-            streams.append(
-                {
-                    "quality": btn.get("data-resolution") or "0",
-                    "audio": btn.get("data-audio") or None,
-                    "url": btn.get("data-src") or None,
-                }
-            )
 
+        # Single pass: keep only the primitive values we need
+        streams = [
+            StreamInfo(
+                _safe_int(btn.get("data-resolution")),
+                btn.get("data-audio") or None,
+                btn.get("data-src") or None,
+            )
+            for btn in _stream_button_attrs(response.data)
+        ]
         if not streams:
             logger.warning("No streams found on the page.")
             return None
 
-        # Log available streams for debugging
-        available_streams_str = ", ".join(
-            [f"{s['quality']}p ({s['audio']})" for s in streams if s.get("quality")]
+        streams.sort(key=_stream_quality)
+        logger.info(
+            "Available streams: %s", ", ".join(f"{s.quality}p ({s.audio})" for s in streams)
         )
-        logger.info("Available streams: %s", available_streams_str)
-
-        for stream in streams:
-            q_raw = stream.get("quality")
-            try:
-                stream["quality_val"] = int(q_raw) if q_raw is not None else 0
-            except (ValueError, TypeError):
-                stream["quality_val"] = 0
-
-        # Sort streams by quality ascending
-        streams.sort(key=lambda s: int(s.get("quality_val", 0)))
-
+        try:
+            # orjson does not serialize named tuples, so store plain arrays
+            await RedisClient.set(
+                cache_key,
+                orjson.dumps([tuple(s) for s in streams]),
+                ex=settings.stream_cache_ttl_seconds,
+            )
+        except RedisError:
+            logger.warning("Failed to cache streams for %s", ep_session, exc_info=True)
         return streams
 
     async def download_episode(
@@ -140,8 +247,8 @@ class AnimeDownloaderService:
         Workflow:
         1) Get stream URL
         2) Get playlist (m3u8)
-        3) Download segments (prefer async function if available)
-        4) Compile into mp4
+        3) Stream segments through ffmpeg into an mp4, or if that fails
+           download them (async, then the blocking downloader) and compile
 
         Args:
             anime_title: The title of the anime.
@@ -159,49 +266,32 @@ class AnimeDownloaderService:
             # stream_url = await self.client.get_stream_url(anime_slug, ep_session, quality=quality, audio=audio)
             streams = await self.get_stream_qualities(anime_slug, ep_session)
 
-            # logic to select quality automatically
-            # --- Audio Selection ---
-            audio_streams = [s for s in streams if s.get("audio") == audio]
-            if not audio_streams:
-                logger.warning(
-                    "Audio '%s' not found. Selecting from available audio languages.", audio
-                )
-                audio_streams = streams  # Fallback to all streams
-
-            # --- Quality Selection ---
-            selected_stream = None
-            stream_qual = None
-            stream_lang = None
+            if not streams:
+                return EpisodeDownloadResult(episode_number, 0, "", None, False, "No streams found")
             try:
                 logger.debug("downloader: quality=%s", quality)
                 target_quality = int(quality)
-                # Find best match: exact or next best available
-                for stream in audio_streams:
-                    if int(stream.get("quality_val", 0)) >= target_quality:
-                        selected_stream = stream
-                        stream_qual = int(stream.get("quality_val", 0))
-                        stream_lang = stream.get('audio', '')
-                        break
-                # If no stream is >= target, pick the best available (last in sorted list)
-                if not selected_stream and audio_streams:
-                    selected_stream = audio_streams[-1]
-                    logger.warning(
-                        "Quality '%sp' not found. Selected next best available: %sp.",
-                        quality,
-                        selected_stream["quality"],
-                    )
             except ValueError:
                 logger.error(
                     "Invalid quality specified: '%s'. Please use a number like '720'.", quality
                 )
                 return None
 
-            if not selected_stream:
-                return EpisodeDownloadResult(
-                    episode_number, 0, stream_lang or "", None, False, "No stream URL"
+            selected_stream = _select_stream(tuple(streams), target_quality, audio)
+            if selected_stream.audio != audio:
+                logger.warning(
+                    "Audio '%s' not found. Selecting from available audio languages.", audio
                 )
+            if selected_stream.quality < target_quality:
+                logger.warning(
+                    "Quality '%sp' not found. Selected next best available: %sp.",
+                    quality,
+                    selected_stream.quality,
+                )
+            stream_qual = selected_stream.quality
+            stream_lang = selected_stream.audio
 
-            stream_url = selected_stream.get("url", None)
+            stream_url = selected_stream.url
             playlist_url = await self.client.get_playlist_url(stream_url)
             if not playlist_url:
                 return EpisodeDownloadResult(
@@ -209,7 +299,9 @@ class AnimeDownloaderService:
                 )
 
             # create a temporary working dir per episode
-            tmpdir = tempfile.mkdtemp(prefix=f"ep_{episode_number}_")
+            tmpdir = await asyncio.to_thread(
+                tempfile.mkdtemp, prefix=f"ep_{episode_number}_", dir=self._scratch_dir()
+            )
             try:
                 logger.info("Downloading episode %d to temp dir %s", episode_number, tmpdir)
                 logger.info("Using playlist URL: %s", playlist_url)
@@ -220,63 +312,93 @@ class AnimeDownloaderService:
                         episode_number, 0, stream_lang or "", None, False, "Failed to fetch playlist"
                     )
 
-                # prefer async downloader if available
-                if download_episode_async is not None:
-                    # parse playlist to get segments etc or rely on helper
-                    success = await download_episode_async(
-                        segments=None,
-                        key=None,
-                        media_sequence=0,
-                        output_dir=tmpdir,
-                        max_concurrent=DEFAULT_NUM_THREADS,
-                    )
-                    # if helper didn't accept None, this call may fail; So fallback to blocking below
-                    if not success:
-                        # fallback to blocking download_from_playlist_cli
-                        success = await self.client.download_from_playlist(
-                            playlist_path, num_threads=DEFAULT_NUM_THREADS
-                        )
-                else:
-                    # blocking download using downloader (run in executor)
-                    success = await self.client.download_from_playlist(
-                        playlist_path, num_threads=DEFAULT_NUM_THREADS
-                    )
-
-                if not success:
-                    return EpisodeDownloadResult(
-                        episode_number, 0, stream_lang or "", None, False, "Failed to download segments"
-                    )
-
-                # compile into an mp4 file
                 out_filename = f"{anime_title.replace('/', '_')}_ep{episode_number}.mp4"
                 output_path = os.path.join(settings.download_dir, out_filename)
-                compiled = await self.client.compile_video(tmpdir, output_path, progress_callback=None)
-                if not compiled:
-                    # maybe the download produced a single file already - check tmpdir for mp4
-                    mp4s = [
-                        os.path.join(tmpdir, f)
-                        for f in os.listdir(tmpdir)
-                        if f.endswith((".mp4", ".mkv"))
-                    ]
-                    if mp4s:
-                        # move first found
-                        shutil.move(mp4s[0], output_path)
-                        compiled = True
-                if not compiled:
-                    return EpisodeDownloadResult(
-                        episode_number, 0, stream_lang or "", None, False, "Failed to compile video"
-                    )
+
+                # Pipe segments straight into ffmpeg so they never touch disk;
+                # on failure fall back to downloading them and compiling
+                if not await remux_playlist(
+                    playlist_path,
+                    output_path,
+                    DEFAULT_NUM_THREADS,
+                    headers=AnimepaheConfig.HTTP_HEADERS,
+                ):
+                    logger.warning("Streaming remux failed, downloading segments to %s", tmpdir)
+                    reason = await self._download_and_compile(tmpdir, playlist_path, output_path)
+                    if reason:
+                        return EpisodeDownloadResult(
+                            episode_number, 0, stream_lang or "", None, False, reason
+                        )
 
                 return EpisodeDownloadResult(
                     episode_number, stream_qual, stream_lang or "", output_path, True, None
                 )
             finally:
-                # remove temp dir after compilation unless debugging (we already moved file)
+                # remove temp dir after compilation unless debugging (we already moved file).
+                # A fallback download can leave hundreds of segments behind, so
+                # the walk runs on a worker thread instead of stalling the loop.
                 try:
-                    if os.path.exists(tmpdir):
-                        shutil.rmtree(tmpdir, ignore_errors=True)
+                    await asyncio.to_thread(shutil.rmtree, tmpdir, ignore_errors=True)
                 except Exception:
                     logger.exception("cleanup tmpdir failed")
         except Exception as exc:
             logger.exception("download_episode error")
             return EpisodeDownloadResult(episode_number, 0, "", None, False, str(exc))
+
+    async def _download_and_compile(
+        self, tmpdir: str, playlist_path: str, output_path: str
+    ) -> Optional[str]:
+        """Download every segment into tmpdir and compile them into output_path.
+
+        Args:
+            tmpdir: The episode's working directory (holds the playlist).
+            playlist_path: Path to the local M3U8 playlist.
+            output_path: Path for the compiled video.
+
+        Returns:
+            None on success, otherwise the failure reason.
+        """
+        success = await download_segments(
+            playlist_path, DEFAULT_NUM_THREADS, headers=AnimepaheConfig.HTTP_HEADERS
+        )
+        if not success:
+            # The blocking downloader skips segments already on disk
+            # and can get past challenge pages aiohttp cannot
+            logger.warning("Async segment download failed, retrying with anime_downloader")
+            success = await self.client.download_from_playlist(
+                playlist_path, num_threads=DEFAULT_NUM_THREADS
+            )
+        if not success:
+            return "Failed to download segments"
+
+        compiled = await self.client.compile_video(tmpdir, output_path, progress_callback=None)
+        if not compiled:
+            # maybe the download produced a single file already - check tmpdir for mp4
+            with os.scandir(tmpdir) as it:
+                mp4s = [
+                    entry.path
+                    for entry in it
+                    if entry.name.endswith((".mp4", ".mkv")) and entry.is_file(follow_symlinks=False)
+                ]
+            if mp4s:
+                # move first found
+                shutil.move(mp4s[0], output_path)
+                compiled = True
+        if not compiled:
+            return "Failed to compile video"
+        return None
+
+
+_service: Optional[AnimeDownloaderService] = None
+
+
+def get_downloader_service() -> AnimeDownloaderService:
+    """Return the process-wide downloader service, creating it on first use.
+
+    The service holds no per-task state, so every DownloadUploadTask shares
+    one instance (and through it the AnimePahe client and HTTP session).
+    """
+    global _service
+    if _service is None:
+        _service = AnimeDownloaderService()
+    return _service
@@ -0,0 +1,246 @@
+"""
+Async HLS segment downloader for anime-bot.
+
+Fetches the AES-128 encrypted segments of an AnimePahe playlist over the
+shared aiohttp session instead of anime_downloader's thread pool. Segments
+are either piped in order straight into ffmpeg (remux_playlist) or written
+under the names Downloader.compile_video expects (download_segments), so
+compilation and resume-by-skipping-existing-files work unchanged.
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+from Crypto.Cipher import AES
+
+from .anime_api import get_http_session
+from .constants import SEGMENT_FETCH_RETRIES, SEGMENT_FETCH_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_KEY_URI_RE = re.compile(r'URI="([^"]+)"')
+
+
+class PlaylistDetails(NamedTuple):
+    """Parsed contents of an encrypted HLS media playlist.
+
+    Attributes:
+        key_url: URL of the AES-128 key.
+        segments: Segment URLs in playback order.
+        media_sequence: Sequence number of the first segment (IV base).
+        duration: Total duration in seconds.
+    """
+
+    key_url: str
+    segments: List[str]
+    media_sequence: int
+    duration: float
+
+
+def parse_playlist(playlist_path: str) -> Optional[PlaylistDetails]:
+    """Parse a local M3U8 playlist.
+
+    Args:
+        playlist_path: Path to the playlist file.
+
+    Returns:
+        PlaylistDetails, or None if the key or segments are missing.
+    """
+    key_url, segments, media_sequence, duration = "", [], 0, 0.0
+    with open(playlist_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXT-X-MEDIA-SEQUENCE"):
+                media_sequence = int(line.split(":")[1])
+            elif line.startswith("#EXT-X-KEY"):
+                match = _KEY_URI_RE.search(line)
+                if match:
+                    key_url = match.group(1)
+            elif line.startswith("#EXTINF:"):
+                try:
+                    duration += float(line.split(":")[1].split(",")[0])
+                except (ValueError, IndexError):
+                    continue
+            elif line.startswith("https"):
+                segments.append(line)
+    if not key_url or not segments:
+        return None
+    return PlaylistDetails(key_url, segments, media_sequence, duration)
+
+
+def segment_path(output_dir: str, segment_url: str) -> str:
+    """Return where a segment is stored, named like anime_downloader does."""
+    return os.path.join(output_dir, os.path.basename(urlparse(segment_url).path))
+
+
+def _decrypt(data: bytes, key: bytes, iv: bytes) -> bytes:
+    """Decrypt an AES-128-CBC segment, zero-padding it to the block size."""
+    if len(data) % 16:
+        data += b"\0" * (16 - len(data) % 16)
+    return AES.new(key, AES.MODE_CBC, iv).decrypt(data)
+
+
+def _decrypt_to_file(data: bytes, key: bytes, iv: bytes, path: str) -> None:
+    """Decrypt an AES-128-CBC segment and atomically write it to path."""
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(_decrypt(data, key, iv))
+    os.replace(tmp_path, path)
+
+
+async def _fetch(url: str, headers: Optional[Dict[str, str]]) -> bytes:
+    """GET a URL over the shared session, retrying transient failures."""
+    session = get_http_session()
+    timeout = aiohttp.ClientTimeout(total=SEGMENT_FETCH_TIMEOUT)
+    for attempt in range(1, SEGMENT_FETCH_RETRIES + 1):
+        try:
+            async with session.get(url, headers=headers, timeout=timeout) as resp:
+                resp.raise_for_status()
+                return await resp.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == SEGMENT_FETCH_RETRIES:
+                raise
+            await asyncio.sleep(2 ** (attempt - 1))
+
+
+async def download_segments(
+    playlist_path: str, max_concurrent: int, headers: Optional[Dict[str, str]] = None
+) -> bool:
+    """Download and decrypt every segment of a playlist next to it.
+
+    Segments that already exist are skipped. Fetches run in an
+    asyncio.TaskGroup bounded by a semaphore; decryption and file writes
+    happen on worker threads.
+
+    Args:
+        playlist_path: Path to the local M3U8 playlist.
+        max_concurrent: Maximum number of segments fetched at once.
+        headers: Extra request headers (e.g. the Referer the CDN requires).
+
+    Returns:
+        True if every segment is on disk, False otherwise.
+    """
+    details = await asyncio.to_thread(parse_playlist, playlist_path)
+    if details is None:
+        logger.error("Could not parse playlist at %s", playlist_path)
+        return False
+
+    output_dir = os.path.dirname(playlist_path)
+    sem = asyncio.Semaphore(max_concurrent)
+
+    async def fetch_segment(key: bytes, index: int, url: str) -> None:
+        path = segment_path(output_dir, url)
+        if os.path.exists(path):
+            return
+        # The IV of each segment is its media sequence number
+        iv = (details.media_sequence + index).to_bytes(16, "big")
+        async with sem:
+            data = await _fetch(url, headers)
+        await asyncio.to_thread(_decrypt_to_file, data, key, iv, path)
+
+    failure: Optional[BaseException] = None
+    try:
+        key = await _fetch(details.key_url, headers)
+        async with asyncio.TaskGroup() as tg:
+            for index, url in enumerate(details.segments):
+                tg.create_task(fetch_segment(key, index, url))
+    except* (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as eg:
+        failure = eg.exceptions[0]
+    if failure is not None:
+        logger.error("Segment download failed for %s: %s", playlist_path, failure)
+        return False
+    return True
+
+
+async def remux_playlist(
+    playlist_path: str,
+    output_path: str,
+    max_concurrent: int,
+    headers: Optional[Dict[str, str]] = None,
+) -> bool:
+    """Stream a playlist's segments through ffmpeg into an mp4 file.
+
+    Up to max_concurrent segments are fetched ahead of the writer; each is
+    decrypted and written to ffmpeg's stdin in playback order, so segments
+    are never stored on disk. The output is written next to output_path and
+    renamed into place only once ffmpeg succeeds.
+
+    Args:
+        playlist_path: Path to the local M3U8 playlist.
+        output_path: Path for the compiled video.
+        max_concurrent: Maximum number of segments fetched ahead of the writer.
+        headers: Extra request headers (e.g. the Referer the CDN requires).
+
+    Returns:
+        True if output_path was written, False otherwise.
+    """
+    ffmpeg_bin = os.environ.get("FFMPEG") or shutil.which("ffmpeg")
+    if not ffmpeg_bin:
+        logger.error("ffmpeg not found in PATH and FFMPEG env var not set")
+        return False
+    details = await asyncio.to_thread(parse_playlist, playlist_path)
+    if details is None:
+        logger.error("Could not parse playlist at %s", playlist_path)
+        return False
+
+    async def fetch_segment(key: bytes, index: int, url: str) -> bytes:
+        iv = (details.media_sequence + index).to_bytes(16, "big")
+        return await asyncio.to_thread(_decrypt, await _fetch(url, headers), key, iv)
+
+    part_path = f"{output_path}.part"
+    proc = await asyncio.create_subprocess_exec(
+        ffmpeg_bin, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "mpegts", "-i", "pipe:0", "-c", "copy", "-f", "mp4", part_path,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    # Read stderr while stdin is being written; a corrupt stream can make
+    # ffmpeg fill the pipe with errors and block until someone reads it
+    stderr_reader = asyncio.create_task(proc.stderr.read())
+    pending: deque = deque()
+    try:
+        key = await _fetch(details.key_url, headers)
+        segments = iter(enumerate(details.segments))
+        for index, url in segments:
+            pending.append(asyncio.create_task(fetch_segment(key, index, url)))
+            if len(pending) >= max_concurrent:
+                break
+        while pending:
+            data = await pending.popleft()
+            nxt = next(segments, None)
+            if nxt is not None:
+                pending.append(asyncio.create_task(fetch_segment(key, *nxt)))
+            proc.stdin.write(data)
+            await proc.stdin.drain()
+        proc.stdin.close()
+        await proc.wait()
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as exc:
+        logger.error("Streaming remux failed for %s: %s", playlist_path, exc)
+    finally:
+        for task in pending:
+            task.cancel()
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        # ffmpeg has exited, so the reader sees EOF and finishes
+        stderr = (await asyncio.gather(stderr_reader, return_exceptions=True))[0]
+    if not isinstance(stderr, bytes):
+        stderr = b""
+
+    if proc.returncode != 0:
+        if stderr:
+            logger.error("ffmpeg exited with %s: %s", proc.returncode, stderr.decode(errors="replace"))
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        return False
+    os.replace(part_path, output_path)
+    return True
@@ -2,22 +2,43 @@
 Logging configuration for anime-bot.
 
 Provides centralized logging setup using the application settings.
+Records are handed to a QueueHandler and written by a background
+QueueListener thread, so logging never does file I/O (or rollover) on
+the event loop thread.
 """
 import logging
+import queue
 from logging import handlers
+from typing import Optional
 
 from .config import settings
 
+_listener: Optional[handlers.QueueListener] = None
+
 
 def configure_logging() -> None:
     """Configure the logging system based on application settings."""
+    global _listener
+    if _listener is not None:
+        return
     level = getattr(logging, settings.log_level.upper(), logging.INFO)
     handler = handlers.RotatingFileHandler(
         "anime_bot.log", maxBytes=1024 * 1024, backupCount=3
     )
     formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
     handler.setFormatter(formatter)
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
     logging.basicConfig(
         level=level,
-        handlers=[handler],
+        handlers=[handlers.QueueHandler(log_queue)],
     )
+    _listener = handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background log writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
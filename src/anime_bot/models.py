@@ -3,8 +3,8 @@ Database models for anime-bot.
 
 Defines SQLAlchemy ORM models for storing uploaded file metadata.
 """
-from sqlalchemy import Column, Integer, String, BigInteger, TIMESTAMP
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import Column, Integer, String, BigInteger, TIMESTAMP, ForeignKey, Index
+from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
 
 Base = declarative_base()
@@ -19,6 +19,9 @@ class Anime(Base):
     alt_titles = Column(String, nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    # lazy="raise": related rows are only ever loaded explicitly (selectinload)
+    files = relationship("UploadedFile", back_populates="anime", lazy="raise")
+
     def __repr__(self):
         return f"<Anime {self.title}>"
     
@@ -29,10 +32,21 @@ class UploadedFile(Base):
     including episode information, chat IDs, and file details.
     """
     __tablename__ = 'uploaded_files'
+    __table_args__ = (
+        # Serves get_latest_uploaded (title + episode, newest first) and
+        # list_uploaded_for_anime (title, by episode) straight from the index.
+        # Its anime_title prefix also covers title-only lookups, so that
+        # column has no index of its own.
+        Index('ix_uploaded_files_title_ep_created', 'anime_title', 'episode', 'created_at'),
+        # API pagination: episodes of one anime in order, and newest uploads
+        # first, both read straight off an index with no sort step.
+        Index('ix_uploaded_files_anime_ep', 'anime_id', 'episode'),
+        Index('ix_uploaded_files_created_id', 'created_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     anime_id = Column(Integer, ForeignKey('anime.id', ondelete='CASCADE'), nullable=False)
-    anime_title = Column(String, nullable=False, index=True)
+    anime_title = Column(String, nullable=False)
     episode = Column(Integer, nullable=False, index=True)
     uploaded_chat_id = Column(BigInteger, nullable=False)
     uploader_user_id = Column(BigInteger, nullable = False)
@@ -45,5 +59,7 @@ class UploadedFile(Base):
     filesize = Column(BigInteger)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    anime = relationship("Anime", back_populates="files", lazy="raise")
+
     def __repr__(self):
         return f"<UploadedFile {self.anime_title} ep{self.episode} file={self.filename}>"
@@ -0,0 +1,106 @@
+"""
+On-disk M3U8 playlist cache for anime-bot.
+
+Playlists are stored under a content-addressed name derived from the
+playlist URL so retries of the same episode skip the fetch from AnimePahe.
+All functions here are blocking and meant to run on an executor thread.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+from .config import settings
+from .constants import PLAYLIST_FILENAME
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_path(playlist_url: str) -> str:
+    """Return the cache file path for a playlist URL."""
+    key = hashlib.blake2b(playlist_url.encode(), digest_size=16).hexdigest()
+    return os.path.join(settings.playlist_cache_dir, f"{key}.m3u8")
+
+
+def load_cached_playlist(playlist_url: str, output_dir: str) -> Optional[str]:
+    """Copy a fresh cached playlist into output_dir.
+
+    Args:
+        playlist_url: URL of the M3U8 playlist.
+        output_dir: Directory the playlist should be placed in.
+
+    Returns:
+        Path to the copied playlist, or None on a cache miss or stale entry.
+    """
+    path = _cache_path(playlist_url)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    now = time.time()
+    if now - st.st_mtime > settings.playlist_cache_ttl_seconds:
+        return None
+    dest = os.path.join(output_dir, PLAYLIST_FILENAME)
+    shutil.copyfile(path, dest)
+    # Bump atime only; mtime stays the write time so the TTL is not extended
+    os.utime(path, (now, st.st_mtime))
+    logger.debug("Playlist cache hit for %s", playlist_url)
+    return dest
+
+
+def store_playlist(playlist_url: str, playlist_path: str) -> None:
+    """Atomically place a downloaded playlist into the cache.
+
+    Args:
+        playlist_url: URL the playlist was fetched from.
+        playlist_path: Path of the downloaded playlist file.
+    """
+    cache_dir = settings.playlist_cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as dst, open(playlist_path, "rb") as src:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, _cache_path(playlist_url))
+    except Exception:
+        logger.exception("Failed to cache playlist %s", playlist_url)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def prune_playlist_cache() -> None:
+    """Drop expired playlists, then evict least recently used ones over the size cap."""
+    cache_dir = settings.playlist_cache_dir
+    if not os.path.isdir(cache_dir):
+        return
+    now = time.time()
+    live = []
+    total = 0
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            try:
+                st = entry.stat()
+                if now - st.st_mtime > settings.playlist_cache_ttl_seconds:
+                    os.remove(entry.path)
+                    continue
+            except OSError:
+                continue
+            live.append((st.st_atime, st.st_size, entry.path))
+            total += st.st_size
+
+    live.sort()
+    for _atime, size, path in live:
+        if total <= settings.playlist_cache_max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            logger.exception("Failed to evict cached playlist %s", path)
@@ -2,13 +2,27 @@
 Redis client module for Anime Bot.
 
 Provides a Redis client instance for caching and session management.
+redis-py picks the C-accelerated hiredis parser automatically when it is
+installed.
 """
+import socket
 
 from redis.asyncio import Redis
 from .config import settings
+from .constants import REDIS_MAX_CONNECTIONS, REDIS_HEALTH_CHECK_INTERVAL
+
+# TCP keepalive tuning knobs are not available on every platform
+_KEEPALIVE_OPTIONS = {
+    opt: value
+    for name, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 30), ("TCP_KEEPCNT", 3))
+    if (opt := getattr(socket, name, None)) is not None
+}
 
 RedisClient = Redis.from_url(
     url=settings.redis_url,
     decode_responses=True,
-    max_connections=5,
-)
\ No newline at end of file
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_keepalive=True,
+    socket_keepalive_options=_KEEPALIVE_OPTIONS,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+)
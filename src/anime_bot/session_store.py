@@ -0,0 +1,63 @@
+"""
+Chat session store for anime-bot.
+
+Persists the per-chat anime selection state in Redis with a TTL, so it
+survives restarts, is shared between bot workers and expires on its own.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from .config import settings
+from .redis_client import RedisClient
+from .utils import index_episodes
+
+logger = logging.getLogger(__name__)
+
+
+def _session_key(chat_id: int) -> str:
+    """Build the Redis key holding the session for a chat."""
+    return f"{settings.session_chat_prefix}{chat_id}"
+
+
+async def put_session(
+    chat_id: int, anime_slug: str, anime_title: str, episodes: List[Dict]
+) -> None:
+    """Store the anime selection state for a chat.
+
+    Only the episode number (as the API returned it) and session of each
+    episode are kept, which is all the download flow needs.
+
+    Args:
+        chat_id: The Telegram chat ID.
+        anime_slug: The anime session/slug identifier.
+        anime_title: The anime title.
+        episodes: Episode dicts as returned by AnimePaheClient.fetch_episodes.
+    """
+    data = {
+        "anime_slug": anime_slug,
+        "anime_title": anime_title,
+        "episodes": [{"episode": ep["episode"], "session": ep["session"]} for ep in episodes],
+    }
+    await RedisClient.set(
+        _session_key(chat_id), orjson.dumps(data), ex=settings.session_ttl_seconds
+    )
+
+
+async def get_session(chat_id: int) -> Optional[Dict[str, Any]]:
+    """Load the anime selection state for a chat.
+
+    Args:
+        chat_id: The Telegram chat ID.
+
+    Returns:
+        Dict with anime_slug, anime_title, episodes and episodes_by_num (an
+        int-keyed episode index) keys, or None if the chat has no live session.
+    """
+    raw = await RedisClient.get(_session_key(chat_id))
+    if raw is None:
+        return None
+    data = orjson.loads(raw)
+    data["episodes_by_num"] = index_episodes(data["episodes"])
+    return data
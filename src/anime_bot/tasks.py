@@ -8,14 +8,14 @@ import asyncio
 import logging
 import os
 import time
-from typing import Callable, Optional, List
+from io import BytesIO
+from typing import Awaitable, Callable, Optional, List, Set, Tuple
 
-from hachoir.metadata import extractMetadata
-from hachoir.parser import createParser
+from telethon.tl.custom.message import Message
 
 from .constants import PROGRESS_UPDATE_INTERVAL
-from .utils import take_screen_shot
-from .downloader import AnimeDownloaderService, EpisodeDownloadResult
+from .utils import episode_number, probe_duration, take_screen_shot
+from .downloader import EpisodeDownloadResult, get_downloader_service
 from .db import insert_uploaded_file
 from .config import settings
 from .uploader import Uploader
@@ -23,6 +23,12 @@ from .uploader import Uploader
 logger = logging.getLogger(__name__)
 
 
+async def _drain_status(queue: "asyncio.Queue[str]", status: Callable[[str], Awaitable[None]]) -> None:
+    """Forward queued status messages to the status callback until cancelled."""
+    while True:
+        await status(await queue.get())
+
+
 class DownloadUploadTask:
     """Task for downloading and uploading anime episodes.
 
@@ -63,7 +69,8 @@ class DownloadUploadTask:
         self.quality = quality
         self.audio = audio
         self.uploader_id = uploader_id
-        self.downloader = AnimeDownloaderService()
+        self.downloader = get_downloader_service()
+        self._finalizers: Set[asyncio.Task] = set()
 
     async def run(self, status_callback: Optional[Callable[[str], None]] = None) -> None:
         """Execute the download and upload task for all episodes.
@@ -81,60 +88,124 @@ class DownloadUploadTask:
                     logger.debug("status callback failed")
 
         await status(f"Starting task: {self.anime_title} episodes {[ep['episode'] for ep in self.episodes]}")
-        for ep_info in self.episodes:
-            ep_num = int(ep_info["episode"])
-            ep_session = ep_info["session"]
-            await status(f"Preparing to download ep {ep_num} ...")
-            logger.debug("tasks- qual: %s, audio: %s", self.quality, self.audio)
-            res: EpisodeDownloadResult = await self.downloader.download_episode(
-                self.anime_title, self.anime_slug, ep_session, ep_num,
-                quality=self.quality, audio=self.audio
-            )
-            if not res.success:
-                await status(f"Download failed ep {ep_num}: {res.reason}")
-                # Respect rate limiting and continue
+        # Episode N+1 downloads while episode N uploads; the one-slot queue
+        # keeps at most one finished episode waiting on disk.
+        ready: asyncio.Queue[Optional[Tuple[int, EpisodeDownloadResult, Optional[BytesIO]]]] = asyncio.Queue(maxsize=1)
+
+        async def produce() -> None:
+            """Download each episode and hand it to the uploader."""
+            for ep_info in self.episodes:
+                ep_num = episode_number(ep_info["episode"])
+                if ep_num is None:
+                    # UploadedFile.episode is an integer column
+                    await status(
+                        f"Skipping ep {ep_info['episode']}: fractional episodes are not supported."
+                    )
+                    continue
+                ep_session = ep_info["session"]
+                await status(f"Preparing to download ep {ep_num} ...")
+                logger.debug("tasks- qual: %s, audio: %s", self.quality, self.audio)
+                res: EpisodeDownloadResult = await self.downloader.download_episode(
+                    self.anime_title, self.anime_slug, ep_session, ep_num,
+                    quality=self.quality, audio=self.audio
+                )
+                if not res.success:
+                    await status(f"Download failed ep {ep_num}: {res.reason}")
+                else:
+                    duration = await probe_duration(res.filepath)
+                    # Get ss for thumbnail
+                    thumb = await take_screen_shot(res.filepath, duration/2)
+                    await ready.put((ep_num, res, thumb))
+
+                # Rate limit between episodes to avoid hammering animepahe
                 await asyncio.sleep(settings.rate_limit_seconds)
-                continue
+            # Only reached on success; if this fails the TaskGroup cancels
+            # the consumer instead
+            await ready.put(None)
+
+        async def consume() -> None:
+            """Upload episodes as they finish downloading."""
+            while (item := await ready.get()) is not None:
+                await self._upload_episode(*item, status)
+
+        # A failure on either side cancels the other, so the producer never
+        # keeps downloading into a queue nobody drains
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(produce())
+                tg.create_task(consume())
+        except ExceptionGroup as eg:
+            # A downloaded episode still waiting in the queue will never be
+            # uploaded, so its file is removed
+            pending = ready.get_nowait() if not ready.empty() else None
+            if pending is not None:
+                try:
+                    await asyncio.to_thread(os.remove, pending[1].filepath)
+                except OSError:
+                    pass
+            raise eg.exceptions[0]
+        finally:
+            await asyncio.gather(*self._finalizers, return_exceptions=True)
+            self._finalizers.clear()
+        await status("Task finished.")
+
+    async def _upload_episode(
+        self,
+        ep_num: int,
+        res: EpisodeDownloadResult,
+        thumb: Optional[BytesIO],
+        status: Callable[[str], Awaitable[None]],
+    ) -> None:
+        """Upload a downloaded episode, record it and clean up its files.
+
+        Args:
+            ep_num: The episode number.
+            res: The successful download result.
+            thumb: The episode's JPEG thumbnail, if one was extracted.
+            status: Coroutine function reporting status updates.
+        """
+        # One stat serves both the sanity check and the recorded filesize
+        try:
+            filesize: Optional[int] = os.stat(res.filepath).st_size
+        except FileNotFoundError:
+            filesize = None
+        if not filesize:
+            await status(f"Upload skipped ep {ep_num}: downloaded file is missing or empty")
+            return
 
-            # Get metadata of video
-            metadata = extractMetadata(createParser(res.filepath))
-            duration = 0
+        # Upload result.filepath
+        try:
+            await status(f"Uploading ep {ep_num} ({os.path.basename(res.filepath)}) ...")
 
-            if metadata.has("duration"):
-                duration = metadata.get("duration").seconds
-            # Get ss for thumbnail
-            thumb = await take_screen_shot(
-                res.filepath, settings.download_dir, duration/2
-            )
+            # Improved progress callback with debouncing and percent threshold
+            last_update = {"time": 0.0, "percent": 0}
+            # At most one pending update; a single consumer sends it so the
+            # upload never waits on a message edit.
+            progress_queue: asyncio.Queue[str] = asyncio.Queue(maxsize=1)
+            consumer = asyncio.create_task(_drain_status(progress_queue, status))
 
-            # Upload result.filepath
+            def progress_cb(current: int, total: int, s_time: float) -> None:
+                """Progress callback for upload status updates."""
+                cur_time = time.monotonic()
+                percent = current * 100 // total if total else 0
+                if (
+                    (cur_time - last_update["time"] >= PROGRESS_UPDATE_INTERVAL)
+                    and (percent - last_update["percent"] >= 5)
+                ) or percent == 100:
+                    last_update["time"] = cur_time
+                    last_update["percent"] = percent
+                    # Replace an update the consumer has not sent yet, so
+                    # the latest progress (including 100%) always wins
+                    if progress_queue.full():
+                        progress_queue.get_nowait()
+                    progress_queue.put_nowait(
+                        f"Uploading ep {ep_num}: {current // (1024 * 1024)}/{total // (1024 * 1024)} MB ({percent}%)"
+                    )
+
+            # TODO: replace chat id with the id of person who uploaded
+            caption = f"{self.anime_title} - Episode {ep_num}\n\nUploaded by: {self.chat_id}"
+            start_time = time.monotonic()
             try:
-                await status(f"Uploading ep {ep_num} ({os.path.basename(res.filepath)}) ...")
-
-                # Improved progress callback with debouncing and percent threshold
-                last_update = {"time": 0, "percent": 0}
-                # progress callback factory
-                def progress_cb(current: int, total: int, s_time: float) -> None:
-                    """Non-blocking progress callback for upload status updates."""
-                    cur_time = time.time()
-                    percent = int((current / total) * 100) if total else 0
-                    if (
-                        (cur_time - last_update["time"] >= PROGRESS_UPDATE_INTERVAL)
-                        and (percent - last_update["percent"] >= 5)
-                    ) or percent == 100:
-                        last_update["time"] = cur_time
-                        last_update["percent"] = percent
-                        try:
-                            status(f"Uploading ep {ep_num}: {current // (1024 * 1024)}/{total // (1024 * 1024)} MB ({percent}%)")
-                            # asyncio.create_task(
-                            #     status(f"Uploading ep {ep_num}: {current // (1024 * 1024)}/{total // (1024 * 1024)} MB")
-                            # )
-                        except Exception:
-                            pass
-
-                # TODO: replace chat id with the id of person who uploaded
-                caption = f"{self.anime_title} - Episode {ep_num}\n\nUploaded by: {self.chat_id}"
-                start_time = time.time()
                 msg = await self.uploader.upload_file(
                     settings.vault_channel_id,
                     res.filepath,
@@ -142,35 +213,44 @@ class DownloadUploadTask:
                     progress_callback=lambda d, t: progress_cb(d, t, start_time),
                     thumbnail=thumb,
                 )
-                filesize = os.path.getsize(res.filepath) if os.path.exists(res.filepath) else None
-                # insert DB
-                try:
-                    await insert_uploaded_file(self.anime_title, ep_num, msg.chat_id, self.uploader_id, res.episode_lang, 
-                                               res.episode_qual, msg.id, os.path.basename(res.filepath), filesize
-                                               )
-                except Exception:
-                    logger.exception("DB insert failed for %s Ep %s", self.anime_title, ep_num)
+            finally:
+                consumer.cancel()
+                await asyncio.gather(consumer, return_exceptions=True)
+            await status(f"Uploaded ep {ep_num} successfully.")
 
-                await status(f"Uploaded ep {ep_num} successfully.")
+        except Exception as e:
+            logger.exception("Upload failed for ep %s", ep_num)
+            await status(f"Upload failed for ep {ep_num}: {e}")
+            msg = None
 
-            except Exception as e:
-                logger.exception("Upload failed for ep %s", ep_num)
-                await status(f"Upload failed for ep {ep_num}: {e}")
+        # Bookkeeping runs in the background so the next upload can start
+        self._finalizers.add(asyncio.create_task(self._finalize(ep_num, res, msg, filesize)))
 
-            # Remove thumbnail image
+    async def _finalize(
+        self, ep_num: int, res: EpisodeDownloadResult, msg: Optional[Message], filesize: int
+    ) -> None:
+        """Record an uploaded episode and delete its local file if configured.
+
+        Args:
+            ep_num: The episode number.
+            res: The download result of the episode.
+            msg: The vault message holding the upload, or None if it failed.
+            filesize: Size of the uploaded file in bytes.
+        """
+        if msg is not None:
+            # insert DB
             try:
-                os.remove(thumb)
+                await insert_uploaded_file(self.anime_title, ep_num, msg.chat_id, self.uploader_id, res.episode_lang, 
+                                           res.episode_qual, msg.id, os.path.basename(res.filepath), filesize
+                                           )
             except Exception:
-                logger.exception("Failed to delete thumbnail image %s", thumb)
+                logger.exception("DB insert failed for %s Ep %s", self.anime_title, ep_num)
 
-            # optionally delete local file if configured
-            if settings.delete_after_upload and res.filepath and os.path.exists(res.filepath):
-                try:
-                    os.remove(res.filepath)
-                except Exception:
-                    logger.exception("Failed to delete file %s", res.filepath)
-
-            # Rate limit between episodes to avoid hammering animepahe
-            await asyncio.sleep(settings.rate_limit_seconds)
-
-        await status("Task finished.")
+        # optionally delete local file if configured
+        if settings.delete_after_upload:
+            try:
+                await asyncio.to_thread(os.remove, res.filepath)
+            except FileNotFoundError:
+                pass
+            except Exception:
+                logger.exception("Failed to delete file %s", res.filepath)
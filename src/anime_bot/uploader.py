@@ -6,35 +6,42 @@ concurrency control.
 """
 import asyncio
 import logging
-from typing import Callable, Optional
+from typing import BinaryIO, Callable, Dict, Optional
 
 from telethon import TelegramClient
 from telethon.tl.custom.message import Message
 
+from .constants import UPLOAD_PART_SIZE_KB
+
 logger = logging.getLogger(__name__)
 
 
 class Uploader:
     """Handles file uploads to Telegram with concurrency control.
 
-    Uses a semaphore to limit the number of concurrent uploads to avoid
-    overwhelming the Telegram API.
+    Telegram's flood limits apply per chat, so each destination chat gets
+    its own semaphore, under an account-wide ceiling on total uploads.
 
     Args:
         client: The Telegram client instance.
-        concurrency: Maximum number of concurrent uploads (default: 2).
+        concurrency: Maximum number of concurrent uploads overall (default: 4).
+        per_chat_concurrency: Maximum concurrent uploads into one chat (default: 2).
     """
 
-    def __init__(self, client: TelegramClient, concurrency: int = 2) -> None:
+    def __init__(
+        self, client: TelegramClient, concurrency: int = 4, per_chat_concurrency: int = 2
+    ) -> None:
         """Initialize the uploader with concurrency control."""
         self.client = client
         self.semaphore = asyncio.Semaphore(concurrency)
+        self._per_chat_concurrency = per_chat_concurrency
+        self._per_chat: Dict[int, asyncio.Semaphore] = {}
 
     async def upload_file(
         self,
         dest_chat: int,
         file_path: str,
-        thumbnail: str,
+        thumbnail: Optional[BinaryIO],
         caption: Optional[str] = None,
         progress_callback: Optional[Callable] = None,
     ) -> Message:
@@ -43,14 +50,17 @@ class Uploader:
         Args:
             dest_chat: The destination chat ID.
             file_path: Path to the file to upload.
-            thumbnail: Path to the thumbnail image.
+            thumbnail: In-memory JPEG thumbnail, if any.
             caption: Optional caption for the file.
             progress_callback: Optional callback for upload progress.
 
         Returns:
             The sent message containing the uploaded file.
         """
-        async with self.semaphore:
+        chat_sem = self._per_chat.get(dest_chat)
+        if chat_sem is None:
+            chat_sem = self._per_chat[dest_chat] = asyncio.Semaphore(self._per_chat_concurrency)
+        async with chat_sem, self.semaphore:
             msg = await self.client.send_file(
                 dest_chat,
                 file_path,
@@ -59,5 +69,6 @@ class Uploader:
                 supports_streaming=True,
                 force_document=False,
                 thumb=thumbnail,
+                part_size_kb=UPLOAD_PART_SIZE_KB,
             )
             return msg
@@ -6,21 +6,48 @@ cache management, and video processing.
 """
 import asyncio
 import datetime
+import heapq
 import logging
-import os
 import re
 import time
+from io import BytesIO
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict
-
-from anime_downloader.utils.constants import ANIME_LIST_CACHE_FILE
+from typing import FrozenSet, Iterable, List, Dict, Optional, Sequence, Tuple
 
 from .anime_api import AnimePaheClient
-from .constants import EXACT_MATCH_SCORE, POSITION_PENALTY, CHAR_MATCH_SCORE
+from .constants import (
+    EXACT_MATCH_SCORE,
+    POSITION_PENALTY,
+    CHAR_MATCH_SCORE,
+    FUZZY_SCORE_CUTOFF,
+    TRIGRAM_MIN_QUERY_LENGTH,
+    TRIGRAM_MIN_SHARED,
+    ANIME_LIST_TTL_SECONDS,
+    STATUS_EDIT_INTERVAL,
+)
 
 logger = logging.getLogger(__name__)
 
-EP_SPEC_RE = re.compile(r"^\d+(-\d+)?(,\d+(-\d+)?)*$")
+# RapidFuzz is an optional accelerator; fall back to fuzzy_score without it
+try:
+    from rapidfuzz import fuzz, process
+    from rapidfuzz.utils import default_process
+except ImportError:
+    fuzz = process = default_process = None
+    logger.info("rapidfuzz not installed, using built-in fuzzy_score")
+
+EP_SPEC_RE = re.compile(r"^\d+(-\d+)?(,\d+(-\d+)?)*$", re.ASCII)
+_EP_SPEC_SCAN = re.compile(r"(\d+)(?:-(\d+))?", re.ASCII)
+
+# Parsed anime list kept in memory between searches, plus a session -> entry
+# index built alongside it. Both are replaced together on refresh.
+_anime_list: List[Dict] = []
+_anime_list_expires_at: float = 0.0
+_anime_list_mtime: float = 0.0
+_anime_by_session: Dict[str, Dict] = {}
+# Serialises reloads so concurrent searches do not all re-download the list
+_anime_list_lock = asyncio.Lock()
 
 def validate_episode_spec(spec: str) -> bool:
     """Validate an episode specification string.
@@ -43,16 +70,34 @@ def expand_episode_spec_to_list(spec: str) -> List[int]:
     Returns:
         Sorted list of episode numbers.
     """
-    parts = [p.strip() for p in spec.split(",") if p.strip()]
-    eps = set()
-    for part in parts:
-        if "-" in part:
-            start, end = part.split("-", 1)
-            for i in range(int(start), int(end) + 1):
-                eps.add(i)
-        else:
-            eps.add(int(part))
-    return sorted(eps)
+    eps: List[int] = []
+    for start, end in _EP_SPEC_SCAN.findall(spec):
+        eps.extend(range(int(start), int(end or start) + 1))
+    # Specs are usually already ascending and disjoint ("1-12", "1,3,5-7")
+    if any(a >= b for a, b in zip(eps, eps[1:])):
+        eps = sorted(set(eps))
+    return eps
+
+
+def episode_number(value: object) -> Optional[int]:
+    """Return an episode number as an int, or None if it is not a whole number.
+
+    AnimePahe numbers some specials fractionally (e.g. 12.5). Uploaded
+    episodes are stored as integers, so those are listed but never offered
+    for download: they get no button, never match an episode spec and are
+    skipped by DownloadUploadTask.
+
+    Args:
+        value: The 'episode' value as returned by the API.
+
+    Returns:
+        The integer episode number, or None.
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else None
 
 
 def pick_episodes_from_episode_list(
@@ -60,19 +105,84 @@ def pick_episodes_from_episode_list(
 ) -> List[Dict]:
     """Filter available episodes to only include desired episode numbers.
 
+    Both lists are walked in step once sorted. The episode list arrives in
+    ascending order and expand_episode_spec_to_list output is sorted, so the
+    sorts are linear and no index dict is built.
+
     Args:
         available_eps: List of episode dicts with 'episode' and 'session' keys.
         desired_numbers: List of episode numbers to select.
 
     Returns:
-        List of matched episode dicts in the order of desired_numbers.
+        List of matched episode dicts in ascending episode order. If an
+        episode number appears more than once, its first entry is used.
+        Episodes without a whole episode number are never matched.
     """
-    index = {int(ep["episode"]): ep for ep in available_eps}
-    result = []
-    for num in desired_numbers:
-        if num in index:
-            result.append(index[num])
-    return result
+    numbered = ((episode_number(ep["episode"]), ep) for ep in available_eps)
+    available = sorted(((num, ep) for num, ep in numbered if num is not None), key=itemgetter(0))
+    desired = sorted(desired_numbers)
+    out = []
+    i = j = 0
+    while i < len(available) and j < len(desired):
+        num, ep = available[i]
+        if num == desired[j]:
+            out.append(ep)
+            i += 1
+            j += 1
+        elif num < desired[j]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+
+def join_until(parts: Iterable[str], sep: str, max_len: int, suffix: str = "...") -> str:
+    """Join parts with sep, stopping before the result would exceed max_len.
+
+    Parts are consumed lazily, so a generator is never exhausted past the
+    point where the output is full.
+
+    Args:
+        parts: Strings to join.
+        sep: Separator placed between parts.
+        max_len: Maximum length of the returned string, suffix included.
+        suffix: Appended when parts had to be dropped.
+
+    Returns:
+        The joined string. Output that fits in max_len is returned whole;
+        the suffix is only reserved once something has to be dropped.
+    """
+    budget = max_len - len(suffix)
+    buf = []
+    total = 0
+    # How many leading parts still fit alongside the suffix
+    cut = 0
+    for part in parts:
+        total += len(part) + (len(sep) if buf else 0)
+        if total > max_len:
+            return sep.join(buf[:cut]) + suffix
+        buf.append(part)
+        if total <= budget:
+            cut = len(buf)
+    return sep.join(buf)
+
+
+def index_episodes(available_eps: List[Dict]) -> Dict[int, Dict]:
+    """Map episode numbers to their episode dicts.
+
+    Args:
+        available_eps: List of episode dicts with 'episode' and 'session' keys.
+
+    Returns:
+        Dict keyed by integer episode number; episodes without a whole
+        episode number are left out.
+    """
+    index = {}
+    for ep in available_eps:
+        num = episode_number(ep["episode"])
+        if num is not None:
+            index.setdefault(num, ep)
+    return index
 
 
 async def load_from_cache(api: AnimePaheClient) -> List[Dict]:
@@ -85,30 +195,27 @@ async def load_from_cache(api: AnimePaheClient) -> List[Dict]:
         api: The AnimePaheClient instance.
 
     Returns:
-        List of anime dicts with 'session' and 'title' keys.
+        List of anime dicts with 'session' and 'title' keys, or an empty list
+        if the cache could not be loaded. The list is shared between callers
+        and must not be mutated.
     """
-#     animes = []
-#     # first check if cache list is fresh enough (not old than 1 day) otherwise download cache list
-# #    1. check if fresh
-#     #00load  to animes
-#     # 2. not fresh cache
-#     # download fresh cache
-#     await api.download_anime_list_cache()
-    
-#     animes = # load from cache config.ANIME_LIST_CACHE_FILE
+    if _anime_list and time.monotonic() < _anime_list_expires_at:
+        return _anime_list
+    async with _anime_list_lock:
+        # Another caller may have reloaded the list while we waited
+        if _anime_list and time.monotonic() < _anime_list_expires_at:
+            return _anime_list
+        return await _reload_anime_list(api)
 
-#     return animes
-    """
-    Load the anime list from the cache file configured in config.ANIME_LIST_CACHE_FILE.
 
-    Behavior:
-    - If the cache file does not exist or is older than 1 day, request the API client
-      to refresh the cache via api.download_anime_list_cache().
-    - Load and return the JSON array from the cache file as a list[dict].
-    - On any error, log and return an empty list.
+async def _reload_anime_list(api: AnimePaheClient) -> List[Dict]:
+    """Refresh the cache file if stale and load it into memory.
 
-    The file IO is executed in a threadpool to avoid blocking the event loop.
+    Must be called with _anime_list_lock held.
     """
+    global _anime_list, _anime_list_expires_at, _anime_list_mtime, _anime_by_session
+    from anime_downloader.utils.constants import ANIME_LIST_CACHE_FILE
+
     cache_path = Path(ANIME_LIST_CACHE_FILE)
     freshness_threshold = datetime.timedelta(days=1)
 
@@ -128,31 +235,240 @@ async def load_from_cache(api: AnimePaheClient) -> List[Dict]:
         if not _is_fresh(cache_path):
             # Attempt to refresh cache; let any exceptions surface to be handled below
             logger.info("Cache is stale or missing, downloading fresh anime list cache...")
-            # await loop.run_in_executor(None, lambda: api._api.download_anime_list_cache)
-            count = api._api.download_anime_list_cache()
+            loop = asyncio.get_running_loop()
+            count = await loop.run_in_executor(None, api._api.download_anime_list_cache)
             logger.info("Downloaded fresh anime list cache with %d entries.", count)
 
-        if not cache_path.exists():
+        try:
+            mtime = cache_path.stat().st_mtime
+        except FileNotFoundError:
             logger.warning("Anime list cache does not exist at %s", cache_path)
             return []
+        # The file only changes when it is refreshed; keep the parsed list
+        # (and its index) while the mtime is the one it was parsed from
+        if _anime_list and mtime == _anime_list_mtime:
+            _anime_list_expires_at = time.monotonic() + ANIME_LIST_TTL_SECONDS
+            return _anime_list
 
         def _read_cache() -> List[Dict]:
             logger.info("Reading anime list cache from %s", cache_path)
-            results = []
-            with cache_path.open("r", encoding="utf-8") as fh:
-                for line in fh:
-                    slug, title = line.strip().split("::::", 1)
-                    results.append({"session": slug, "title": title})
-            if results == []:
+            # One bulk read and a comprehension instead of a readline loop
+            results = [
+                {"session": slug, "title": title, "_norm_title": normalize_title(title)}
+                for line in cache_path.read_text(encoding="utf-8").splitlines()
+                if "::::" in line
+                for slug, title in (line.strip().split("::::", 1),)
+            ]
+            # Character masks only serve the built-in scorer
+            if process is None:
+                for anime in results:
+                    anime["_char_mask"] = char_mask(anime["_norm_title"])
+            if not results:
                 raise ValueError("Cache file is empty")
             return results
 
-        animes = _read_cache() 
+        animes = _read_cache()
+        _anime_list = animes
+        _anime_list_mtime = mtime
+        _anime_by_session = {anime["session"]: anime for anime in animes if anime["session"]}
+        _anime_list_expires_at = time.monotonic() + ANIME_LIST_TTL_SECONDS
         return animes
     except Exception as exc:
         logger.exception("Failed to load anime list cache: %s", exc)
         return []
+
+
+async def load_from_cache_by_session(api: AnimePaheClient) -> Dict[str, Dict]:
+    """Load the cached anime list indexed by session.
+
+    Args:
+        api: The AnimePaheClient instance.
+
+    Returns:
+        Dict mapping anime session/slug to its entry from load_from_cache.
+    """
+    await load_from_cache(api)
+    return _anime_by_session
+
+
+async def get_title_for_session(api: AnimePaheClient, session: str) -> Optional[str]:
+    """Resolve an anime session/slug to its title using the cached anime list.
+
+    Args:
+        api: The AnimePaheClient instance.
+        session: The anime session/slug identifier.
+
+    Returns:
+        The anime title, or None if the session is not in the list.
+    """
+    anime = (await load_from_cache_by_session(api)).get(session)
+    return anime["title"] if anime else None
     
+def normalize_title(text: str) -> str:
+    """Normalize a title or query for fuzzy matching.
+
+    Args:
+        text: The raw title or query.
+
+    Returns:
+        The normalized string used as the matching key.
+    """
+    if default_process is not None:
+        return default_process(text)
+    return text.lower()
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Return the character trigrams of an already normalized string.
+
+    The string is padded with a space on each side so word boundaries
+    count as trigrams too.
+
+    Args:
+        text: A normalize_title() result.
+
+    Returns:
+        Frozen set of three-character substrings.
+    """
+    padded = f" {text} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def char_mask(text: str) -> int:
+    """Summarise which letters and digits occur in a string as a 64-bit mask.
+
+    A title can only contain the query as a subsequence if its mask covers
+    the query's mask, so one AND rejects most titles before scoring.
+    Characters outside 0-9/A-z share bits, which only weakens the filter.
+
+    Args:
+        text: A normalize_title() result.
+
+    Returns:
+        Bitmask with one bit set per distinct alphanumeric character.
+    """
+    mask = 0
+    for c in text:
+        if c.isalnum():
+            mask |= 1 << ((ord(c) - 48) & 63)
+    return mask
+
+
+def rank_animes(animes: List[Dict], query: str, limit: int) -> List[Dict]:
+    """Rank anime entries against a search query.
+
+    Uses the titles normalized at cache load time as match keys.
+
+    Args:
+        animes: Anime dicts as returned by load_from_cache.
+        query: The search query.
+        limit: Maximum number of entries to return.
+
+    Returns:
+        Up to ``limit`` anime dicts, best match first.
+    """
+    # RapidFuzz scores the whole list itself; masks only help fuzzy_score
+    title_masks = [anime["_char_mask"] for anime in animes] if process is None else None
+    indices = _rank_indices(
+        [anime["_norm_title"] for anime in animes], query, limit, title_masks=title_masks
+    )
+    return [animes[idx] for idx in indices]
+
+
+def rank_titles(
+    titles: List[str],
+    query: str,
+    limit: int,
+    norm_titles: Optional[List[str]] = None,
+    title_trigrams: Optional[Sequence[FrozenSet[str]]] = None,
+) -> List[str]:
+    """Rank plain titles against a search query.
+
+    Args:
+        titles: Candidate titles.
+        query: The search query.
+        limit: Maximum number of titles to return.
+        norm_titles: Precomputed normalize_title() of each title, if available.
+        title_trigrams: Precomputed trigrams() of each normalized title. When
+            given, only titles sharing enough trigrams with the query are scored.
+
+    Returns:
+        Up to ``limit`` titles, best match first.
+    """
+    if norm_titles is None:
+        norm_titles = [normalize_title(t) for t in titles]
+    indices = _rank_indices(norm_titles, query, limit, title_trigrams)
+    return [titles[idx] for idx in indices]
+
+
+def _trigram_candidates(
+    title_trigrams: Sequence[FrozenSet[str]], q_norm: str, limit: int
+) -> Optional[List[int]]:
+    """Return indices of titles worth scoring, or None to score them all.
+
+    The prefilter is skipped for short queries, and whenever it would leave
+    fewer than ``limit`` candidates so weak but valid matches are not lost.
+    """
+    if len(q_norm) < TRIGRAM_MIN_QUERY_LENGTH:
+        return None
+    q_trigrams = trigrams(q_norm)
+    candidates = [
+        idx for idx, tg in enumerate(title_trigrams) if len(q_trigrams & tg) >= TRIGRAM_MIN_SHARED
+    ]
+    return candidates if len(candidates) >= limit else None
+
+
+def _rank_indices(
+    norm_titles: List[str],
+    query: str,
+    limit: int,
+    title_trigrams: Optional[Sequence[FrozenSet[str]]] = None,
+    title_masks: Optional[Sequence[int]] = None,
+) -> List[int]:
+    """Return indices of the best matching normalized titles, best first.
+
+    Uses RapidFuzz's batch extractor when available, otherwise scores each
+    title with the fuzzy_score algorithm. With title_trigrams, a trigram
+    prefilter first narrows the titles that get scored. With title_masks
+    (char_mask() of each title), fuzzy_score skips titles missing any of
+    the query's characters; RapidFuzz tolerates those, so it ignores them.
+    """
+    q_norm = normalize_title(query)
+    candidates = None
+    if title_trigrams is not None:
+        candidates = _trigram_candidates(title_trigrams, q_norm, limit)
+
+    if process is not None:
+        choices = norm_titles if candidates is None else [norm_titles[i] for i in candidates]
+        matches = process.extract(
+            q_norm,
+            choices,
+            scorer=fuzz.WRatio,
+            processor=None,
+            limit=limit,
+            score_cutoff=FUZZY_SCORE_CUTOFF,
+        )
+        if candidates is None:
+            return [idx for _, _, idx in matches]
+        return [candidates[idx] for _, _, idx in matches]
+
+    # Without RapidFuzz normalize_title is lower(), so the query is lowered
+    # once here and the pre-lowered titles are scored directly.
+    if candidates is None:
+        candidates = range(len(norm_titles))
+    if title_masks is not None:
+        q_mask = char_mask(q_norm)
+        candidates = [idx for idx in candidates if title_masks[idx] & q_mask == q_mask]
+    scored = (
+        (score, idx)
+        for idx in candidates
+        if (score := _fuzzy_score_lowered(norm_titles[idx], q_norm)) > 0
+    )
+    # Bounded heap fed straight from the generator: O(N log limit), and no
+    # list of every scored title is materialised
+    return [idx for _, idx in heapq.nlargest(limit, scored, key=itemgetter(0))]
+
+
 def fuzzy_score(title: str, query: str) -> int:
     """Calculate a fuzzy match score between a title and query.
 
@@ -165,8 +481,16 @@ def fuzzy_score(title: str, query: str) -> int:
     Returns:
         Score indicating match quality (higher is better, 0 means no match).
     """
-    title = title.lower()
-    query = query.lower()
+    return _fuzzy_score_lowered(title.lower(), query.lower())
+
+
+def _fuzzy_score_lowered(title: str, query: str) -> int:
+    """fuzzy_score for a title and query that are already lowercased."""
+    if title == query:
+        return EXACT_MATCH_SCORE
+    # A longer query cannot be a subsequence of the title
+    if len(query) > len(title):
+        return 0
 
     # Exact substring → best score
     if query in title:
@@ -207,35 +531,128 @@ async def run_command(command: List[str]) -> tuple:
     return t_response, e_response
 
 
-async def take_screen_shot(
-    video_file: str, output_directory: str, ttl: float
-) -> str | None:
-    """Extract a screenshot from a video file using ffmpeg.
+async def run_command_bytes(command: List[str]) -> Tuple[bytes, str]:
+    """Run a command asynchronously and capture its raw stdout.
+
+    Args:
+        command: List of command arguments to execute.
+
+    Returns:
+        Tuple of (stdout as bytes, stderr as a string).
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    return stdout, stderr.decode(errors="replace").strip()
+
+
+async def probe_duration(video_file: str) -> float:
+    """Read a video's duration with ffprobe without blocking the event loop.
+
+    Args:
+        video_file: Path to the video file.
+
+    Returns:
+        Duration in seconds, or 0.0 if it could not be determined.
+    """
+    try:
+        stdout, _ = await run_command(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "default=nw=1:nk=1",
+                video_file,
+            ]
+        )
+    except OSError as exc:
+        logger.warning("Could not run ffprobe on %s: %s", video_file, exc)
+        return 0.0
+    try:
+        return float(stdout)
+    except ValueError:
+        logger.warning("Could not read duration of %s", video_file)
+        return 0.0
+
+
+async def take_screen_shot(video_file: str, ttl: float) -> Optional[BytesIO]:
+    """Extract a JPEG screenshot from a video file using ffmpeg.
+
+    The frame is read from ffmpeg's stdout, so nothing is written to disk.
 
     Args:
         video_file: Path to the video file.
-        output_directory: Directory to save the screenshot.
         ttl: Time position in seconds to take the screenshot.
 
     Returns:
-        Path to the screenshot file, or None if extraction failed.
+        The JPEG in memory, or None if extraction failed.
     """
     # https://stackoverflow.com/a/13891070/4723940
-    out_put_file_name = output_directory + "/" + str(time.time()) + ".jpg"
     file_generator_command = [
         "ffmpeg",
+        "-noaccurate_seek",
         "-ss",
         str(ttl),
         "-i",
         video_file,
-        "-vframes",
+        "-frames:v",
         "1",
-        out_put_file_name,
+        "-f",
+        "mjpeg",
+        "-",
     ]
-    # width = "90"
-    t_response, e_response = await run_command(file_generator_command)
-    if os.path.lexists(out_put_file_name):
-        return out_put_file_name
+    image, e_response = await run_command_bytes(file_generator_command)
+    if image:
+        thumb = BytesIO(image)
+        # Telethon derives the uploaded file's name and type from .name
+        thumb.name = "thumb.jpg"
+        return thumb
     logger.info(e_response)
-    logger.info(t_response)
-    return None
\ No newline at end of file
+    return None
+
+class StatusEditor:
+    """Coalesce status updates into rate-limited edits of one message.
+
+    Only the most recent text is kept; the message is edited at most once
+    per ``min_interval`` seconds and the final text is always delivered.
+
+    Args:
+        message: The Telegram message to edit.
+        min_interval: Minimum seconds between two edits.
+    """
+
+    def __init__(self, message, min_interval: float = STATUS_EDIT_INTERVAL) -> None:
+        """Initialize the status editor."""
+        self._message = message
+        self._min_interval = min_interval
+        self._pending: Optional[str] = None
+        self._last: Optional[str] = None
+        self._drain_task: Optional[asyncio.Task] = None
+
+    async def set(self, text: str) -> None:
+        """Queue ``text`` as the next status, replacing any not yet sent.
+
+        Args:
+            text: The status text.
+        """
+        self._pending = text
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        """Send pending text, then wait out the interval before the next edit."""
+        while self._pending is not None:
+            text, self._pending = self._pending, None
+            if text != self._last:
+                try:
+                    await self._message.edit(text)
+                    self._last = text
+                except Exception:
+                    logger.debug("status edit failed", exc_info=True)
+            await asyncio.sleep(self._min_interval)
@@ -3,8 +3,10 @@ Authentication module for the API.
 
 Provides JWT-based authentication for securing API endpoints.
 """
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Annotated, Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -23,6 +25,14 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 # JWT settings
 ALGORITHM = "HS256"
 
+# Tokens that already passed verification, keyed by (signing secret, token)
+# and mapped to (username, exp as a Unix timestamp), least recently used
+# first. Clients resend the same Bearer token on every request, so the HMAC
+# check and JSON decode run once per token, not per request. Keying on the
+# secret means rotating api_secret_key stops every cached token matching.
+TOKEN_CACHE_MAX_ENTRIES = 10000
+_verified_tokens: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
@@ -72,6 +82,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
 
     Raises HTTPException if token is invalid.
     """
+    cache_key = (api_settings.api_secret_key, token)
+    hit = _verified_tokens.get(cache_key)
+    if hit is not None:
+        username, expires_at = hit
+        if time.time() < expires_at and username == api_settings.api_username:
+            _verified_tokens.move_to_end(cache_key)
+            return username
+        del _verified_tokens[cache_key]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -91,4 +110,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
     if token_data.username != api_settings.api_username:
         raise credentials_exception
 
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)):
+        _verified_tokens[cache_key] = (token_data.username, float(expires_at))
+        if len(_verified_tokens) > TOKEN_CACHE_MAX_ENTRIES:
+            _verified_tokens.popitem(last=False)
     return token_data.username
+
+
+# Shared Annotated alias so every protected route declares the same dependency
+UserDep = Annotated[str, Depends(get_current_user)]
@@ -0,0 +1,77 @@
+"""
+Redis response cache for the API.
+
+Shares cached responses between worker processes. Redis is optional: with
+no redis_url configured, or while Redis is unreachable, every lookup is a
+miss and callers fall back to the database.
+"""
+import logging
+from typing import Optional, Union
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from .config import api_settings
+
+logger = logging.getLogger(__name__)
+
+_redis: Optional[Redis] = None
+
+
+def get_redis() -> Optional[Redis]:
+    """
+    Return the process-wide Redis client, creating it on first use.
+
+    Returns:
+        The client, or None when no redis_url is configured.
+    """
+    global _redis
+    if _redis is None and api_settings.redis_url:
+        _redis = Redis.from_url(api_settings.redis_url)
+    return _redis
+
+
+async def close_redis() -> None:
+    """Close the process-wide Redis client if one was created."""
+    global _redis
+    if _redis is not None:
+        await _redis.close()
+    _redis = None
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    """
+    Read a cached value.
+
+    Args:
+        key: Redis key of the value.
+
+    Returns:
+        The cached bytes, or None on a miss or when Redis is unavailable.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(key)
+    except RedisError as e:
+        logger.warning(f"Redis cache read failed for {key}: {e}")
+        return None
+
+
+async def cache_set(key: str, value: Union[bytes, str], ttl_seconds: int) -> None:
+    """
+    Store a value that expires after ttl_seconds; failures are only logged.
+
+    Args:
+        key: Redis key of the value.
+        value: Value to cache.
+        ttl_seconds: Lifetime of the entry.
+    """
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.set(key, value, ex=ttl_seconds)
+    except RedisError as e:
+        logger.warning(f"Redis cache write failed for {key}: {e}")
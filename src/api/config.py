@@ -3,6 +3,9 @@ API configuration module.
 
 Extends the base anime-bot settings with API-specific configuration.
 """
+import os
+
+from pydantic import Field
 from pydantic_settings import BaseSettings
 from typing import Optional
 from src.config import CommonSettings
@@ -14,6 +17,9 @@ class APISettings(CommonSettings):
     # API Server settings
     api_host: str = "0.0.0.0"
     api_port: int = 8000
+    # Worker processes; ignored while debug auto-reload is on. Each worker
+    # keeps its own response cache and connection pool.
+    api_workers: int = Field(default_factory=lambda: max(2, os.cpu_count() or 1))
 
     # Authentication
     api_secret_key: str = "change-this-secret-key-in-production"
@@ -27,6 +33,23 @@ class APISettings(CommonSettings):
     # Rate limiting
     rate_limit_per_minute: int = 60
 
+    # Database connection pool, per worker process
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_timeout: float = 5.0
+    db_pool_recycle: int = 1800
+    # Prepared statements asyncpg caches per connection; set 0 behind
+    # PgBouncer in transaction pooling mode
+    db_statement_cache_size: int = 500
+
+    # Lifetime of cached slow-changing responses (anime titles, stats)
+    api_cache_ttl_seconds: int = 60
+
+    # Redis shared by all workers for caching /search results; unset
+    # disables that cache
+    redis_url: Optional[str] = None
+    search_cache_ttl_seconds: int = 60
+
     # Inherit model_config from CommonSettings; no extra Config class needed
 
 
@@ -4,27 +4,62 @@ Database module for the API.
 Provides async database session management for FastAPI dependency injection.
 Reuses the existing database configuration from anime_bot.
 """
-from typing import AsyncGenerator
+import asyncio
+from typing import Annotated, Any, AsyncGenerator, Dict, List, Sequence
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from fastapi import Depends
+from sqlalchemy import Row
+from sqlalchemy.sql import Executable
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
 from .config import api_settings
 
+
+def _database_url() -> str:
+    """Return the configured URL, with plain PostgreSQL URLs pinned to asyncpg."""
+    url = api_settings.database_url
+    for scheme in ("postgresql://", "postgres://"):
+        if url.startswith(scheme):
+            return "postgresql+asyncpg://" + url[len(scheme):]
+    return url
+
+
+def _connect_args(url: str) -> Dict[str, Any]:
+    """Return driver connect arguments: asyncpg statement caching for PostgreSQL."""
+    if not url.startswith("postgresql+asyncpg://"):
+        return {}
+    return {
+        "prepared_statement_cache_size": api_settings.db_statement_cache_size,
+        "statement_cache_size": api_settings.db_statement_cache_size,
+    }
+
+
+def _pool_options() -> Dict[str, Any]:
+    """Return explicit pool sizing, unless the URL uses a single shared connection."""
+    # In-memory SQLite runs on a StaticPool, which takes no sizing arguments
+    if api_settings.database_url.startswith("sqlite") and ":memory:" in api_settings.database_url:
+        return {}
+    return {
+        "pool_size": api_settings.db_pool_size,
+        "max_overflow": api_settings.db_max_overflow,
+        "pool_timeout": api_settings.db_pool_timeout,
+        "pool_recycle": api_settings.db_pool_recycle,
+    }
+
+
 # Create async engine
+_url = _database_url()
 engine = create_async_engine(
-    api_settings.database_url,
-    future=True,
+    _url,
     echo=False,
     pool_pre_ping=True,
+    connect_args=_connect_args(_url),
+    **_pool_options(),
 )
+IS_POSTGRESQL = engine.dialect.name == "postgresql"
 
 # Session factory
-AsyncSessionLocal = sessionmaker(
-    engine,
-    expire_on_commit=False,
-    class_=AsyncSession,
-)
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -36,11 +71,33 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 
     Usage:
         @app.get("/items")
-        async def get_items(db: AsyncSession = Depends(get_db)):
+        async def get_items(db: DbDep):
             ...
     """
     async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+        yield session
+
+
+# Shared Annotated alias so every route declares the same dependency
+DbDep = Annotated[AsyncSession, Depends(get_db)]
+
+
+async def fetch_all_concurrently(*statements: Executable) -> List[Sequence[Row]]:
+    """
+    Run independent read statements in parallel on separate pooled sessions.
+
+    A single AsyncSession cannot run two statements at once, so each
+    statement gets its own session and the rows are fully fetched before
+    it is closed.
+
+    Args:
+        *statements: SELECT statements to execute.
+
+    Returns:
+        List with the fetched rows of each statement, in argument order.
+    """
+    async def _fetch(statement: Executable) -> Sequence[Row]:
+        async with AsyncSessionLocal() as session:
+            return (await session.execute(statement)).all()
+
+    return list(await asyncio.gather(*(_fetch(stmt) for stmt in statements)))
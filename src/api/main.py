@@ -4,14 +4,17 @@ FastAPI application entry point.
 Creates and configures the FastAPI application with all routes,
 middleware, and exception handlers.
 """
+import hashlib
 import logging
+import sys
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable, Optional
 
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 
+from .cache import close_redis
 from .config import api_settings
 from .routes import auth, files, health, search
 
@@ -32,6 +35,7 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     yield
     # Shutdown
     logger.info("Shutting down API server...")
+    await close_redis()
 
 
 # Create FastAPI application
@@ -43,6 +47,8 @@ app = FastAPI(
     redoc_url="/redoc",
     lifespan=lifespan,
     debug=api_settings.debug,
+    # orjson serialises the validated models' datetimes and ints in C
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -56,6 +62,59 @@ app.add_middleware(
 )
 
 
+# GET responses that are worth letting clients reuse briefly. They sit
+# behind Bearer auth, so only private (browser) caches may keep them.
+CLIENT_CACHEABLE_PATHS = frozenset({"/files/anime-titles", "/files/stats"})
+CLIENT_CACHE_MAX_AGE = 30  # seconds
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weakly compare an ETag against the entity tags listed in If-None-Match."""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+@app.middleware("http")
+async def etag_middleware(request: Request, call_next: Callable) -> Response:
+    """Tag the client-cacheable GET responses with a weak ETag and honour If-None-Match."""
+    response = await call_next(request)
+    if (
+        request.method != "GET"
+        or request.url.path not in CLIENT_CACHEABLE_PATHS
+        or response.status_code != status.HTTP_200_OK
+    ):
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    # raw_headers keeps repeated headers such as several set-cookie lines
+    raw_headers = [
+        (name, value) for name, value in response.raw_headers
+        if name not in (b"etag", b"cache-control")
+    ]
+    raw_headers.append((b"etag", etag.encode()))
+    raw_headers.append((b"cache-control", f"private, max-age={CLIENT_CACHE_MAX_AGE}".encode()))
+    background = getattr(response, "background", None)
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        not_modified = Response(status_code=status.HTTP_304_NOT_MODIFIED, background=background)
+        not_modified.raw_headers = [
+            (name, value) for name, value in raw_headers
+            if name not in (b"content-length", b"content-type")
+        ]
+        return not_modified
+    tagged = Response(content=body, status_code=response.status_code, background=background)
+    # The body is unchanged, so the original content-length still holds
+    tagged.raw_headers = raw_headers
+    return tagged
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception) -> JSONResponse:
@@ -78,11 +137,16 @@ def run_server() -> None:
     """Run the API server using uvicorn."""
     import uvicorn
 
+    # uvicorn[standard] installs uvloop and httptools; name them so a missing
+    # one fails loudly instead of silently falling back to asyncio/h11
     uvicorn.run(
         "src.api.main:app",
         host=api_settings.api_host,
         port=api_settings.api_port,
         reload=api_settings.debug,
+        workers=None if api_settings.debug else api_settings.api_workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level="info",
     )
 
@@ -3,97 +3,220 @@ Uploaded files routes.
 
 Provides endpoints for accessing uploaded file data.
 """
-from typing import Optional
-
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select, func
+import base64
+import binascii
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from sqlalchemy import lambda_stmt, literal, select, func, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, load_only, noload, selectinload
 
-from ..auth import get_current_user
-from ..database import get_db
+from ..auth import UserDep
+from ..config import api_settings
+from ..database import IS_POSTGRESQL, DbDep, fetch_all_concurrently
 from ..schemas import (
     UploadedFileResponse,
     UploadedFileListResponse,
     AnimeTitleListResponse,
     AnimeTitleItem,
     StatsResponse,
+    UPLOADED_FILE_LIST_ADAPTER,
+    ANIME_TITLE_LIST_ADAPTER,
 )
 
-# Import the model from anime_bot
-import sys
-import os
-
-# Add parent directory to path if needed for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from anime_bot.models import UploadedFile, Anime
+from src.anime_bot.models import UploadedFile, Anime
 import logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/files", tags=["Uploaded Files"])
 
+T = TypeVar("T")
+
+# Columns AnimeTitleItem needs; anything else on Anime is left unloaded
+ANIME_ITEM_COLUMNS = (Anime.id, Anime.title, Anime.alt_titles)
+
+# AnimeTitleItem built as a PostgreSQL JSON object, splitting alt_titles
+# like AnimeTitleItem.split_alt_titles does
+ANIME_ITEM_JSON_SQL = (
+    "json_build_object('id', id, 'title', title, "
+    "'alt_titles', array_remove(string_to_array(coalesce(alt_titles, ''), '|'), ''))"
+)
+ANIME_TITLES_JSON_QUERY = text(
+    "SELECT json_build_object("
+    f"'titles', coalesce(json_agg({ANIME_ITEM_JSON_SQL} ORDER BY title), '[]'::json), "
+    "'total', count(*))::text FROM anime"
+)
+
+# Responses that change slowly, kept per worker process until they expire
+_response_cache: Dict[str, Tuple[float, Any]] = {}
+
+
+async def _cached(key: str, load: Callable[[], Awaitable[T]]) -> T:
+    """
+    Return a cached value, calling load to refresh it once it has expired.
+
+    Args:
+        key: Cache key of the value.
+        load: Coroutine function producing a fresh value.
+
+    Returns:
+        The cached or freshly loaded value.
+    """
+    now = time.monotonic()
+    hit = _response_cache.get(key)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    value = await load()
+    _response_cache[key] = (now + api_settings.api_cache_ttl_seconds, value)
+    return value
+
+
+def _encode_cursor(sort_value: Any, last_id: int) -> str:
+    """
+    Build the opaque cursor pointing just past a row.
+
+    The cursor is base64("<sort value>|<id>"), with datetimes in ISO format.
+
+    Args:
+        sort_value: The row's value of the column the page is ordered by.
+        last_id: ID of the last row on the current page.
+
+    Returns:
+        URL-safe cursor string.
+    """
+    if isinstance(sort_value, datetime):
+        raw_value = sort_value.isoformat()
+    else:
+        raw_value = "" if sort_value is None else str(sort_value)
+    return base64.urlsafe_b64encode(f"{raw_value}|{last_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str, parse_value: Callable[[str], Any]) -> Tuple[Any, int]:
+    """
+    Recover the sort value and row ID a cursor points past.
+
+    Args:
+        cursor: Cursor from a previous response's next_cursor.
+        parse_value: Converts the encoded sort value back (e.g. int).
+
+    Returns:
+        Tuple of (sort value or None, row ID).
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    try:
+        raw_value, raw_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return (parse_value(raw_value) if raw_value else None), int(raw_id)
+    except (ValueError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def _after_cursor(sort_column: Any, cursor: Tuple[Any, int], descending: bool) -> Any:
+    """
+    Keyset condition selecting the rows that follow a cursor row.
+
+    The cursor row's stored sort value is preferred, so timestamps compare
+    in their stored form; the value carried in the cursor takes over if
+    that row has been deleted since, so pagination carries on.
+
+    Args:
+        sort_column: UploadedFile column the page is ordered by (id breaks ties).
+        cursor: Decoded (sort value, id) of the cursor row.
+        descending: Whether the page is ordered newest/highest first.
+
+    Returns:
+        SQL expression for the WHERE clause.
+    """
+    sort_value, last_id = cursor
+    anchor = aliased(UploadedFile)
+    stored_value = (
+        select(getattr(anchor, sort_column.key)).where(anchor.id == last_id).scalar_subquery()
+    )
+    anchor_value = func.coalesce(stored_value, literal(sort_value, sort_column.type))
+    row = tuple_(sort_column, UploadedFile.id)
+    bound = tuple_(anchor_value, last_id)
+    return row < bound if descending else row > bound
+
 
 @router.get("/", response_model=UploadedFileListResponse)
 async def list_files(
+    current_user: UserDep,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
     anime_title: Optional[str] = Query(None, description="Filter by anime title"),
     episode: Optional[int] = Query(None, ge=1, description="Filter by episode number"),
-    db: AsyncSession = Depends(get_db),
-    current_user: str = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    include_total: bool = Query(False, description="Count matching files on every page"),
 ) -> UploadedFileListResponse:
     """
     List uploaded files with pagination and optional filtering.
 
+    One row past the page is fetched to tell whether another page follows.
+    The COUNT query only runs for the first offset page or when
+    include_total is set, concurrently with the page on a second pooled
+    session. With a cursor the page is found by keyset instead of OFFSET,
+    so deep pages cost the same as the first.
+
     Args:
-        page: Page number (1-indexed).
+        current_user: Authenticated user.
+        page: Page number (1-indexed), ignored when cursor is given.
         page_size: Number of items per page.
         anime_title: Optional filter by anime title.
         episode: Optional filter by episode number.
-        db: Database session.
-        current_user: Authenticated user.
+        cursor: Optional keyset cursor from a previous response.
+        include_total: Whether to count the matching files on every page.
 
     Returns:
         UploadedFileListResponse: Paginated list of uploaded files.
     """
-    # Build base query with join
-    query = select(UploadedFile, Anime).join(Anime, UploadedFile.anime_id == Anime.id)
-    count_query = select(func.count(UploadedFile.id)).join(Anime, UploadedFile.anime_id == Anime.id)
+    # Related anime rows arrive in one extra IN query for the whole page
+    query = select(UploadedFile).options(selectinload(UploadedFile.anime).load_only(*ANIME_ITEM_COLUMNS))
+    # anime_id is a non-null foreign key, so the count only needs Anime to
+    # filter by title
+    count_query = select(func.count(UploadedFile.id))
 
     # Apply filters
     if anime_title:
-        query = query.where(Anime.title.ilike(f"%{anime_title}%"))
-        count_query = count_query.where(Anime.title.ilike(f"%{anime_title}%"))
+        query = query.join(UploadedFile.anime).where(Anime.title.ilike(f"%{anime_title}%"))
+        count_query = (
+            count_query.join(Anime, UploadedFile.anime_id == Anime.id)
+            .where(Anime.title.ilike(f"%{anime_title}%"))
+        )
     if episode is not None:
         query = query.where(UploadedFile.episode == episode)
         count_query = count_query.where(UploadedFile.episode == episode)
 
-    # Get total count
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-
-    # Apply pagination
-    offset = (page - 1) * page_size
-    query = (
-        query.order_by(UploadedFile.created_at.desc())
-        .offset(offset)
-        .limit(page_size)
-    )
-
-    # Execute query
-    result = await db.execute(query)
-    rows = result.fetchall()
+    query = query.order_by(UploadedFile.created_at.desc(), UploadedFile.id.desc())
+    if cursor:
+        query = query.where(
+            _after_cursor(
+                UploadedFile.created_at,
+                _decode_cursor(cursor, datetime.fromisoformat),
+                descending=True,
+            )
+        )
+    else:
+        query = query.offset((page - 1) * page_size)
+    # One extra row tells whether another page follows
+    query = query.limit(page_size + 1)
 
-    # Build episode items with anime object
-    episode_items = []
-    for file, anime in rows:
-        alt_titles = [t for t in anime.alt_titles.split('|') if t] if anime.alt_titles else []
-        anime_item = AnimeTitleItem(id=anime.id, title=anime.title, alt_titles=alt_titles)
-        episode_dict = file.__dict__.copy()
-        episode_dict['anime'] = anime_item
-        episode_items.append(UploadedFileResponse.model_validate(episode_dict))
+    if include_total or (page == 1 and not cursor):
+        count_rows, rows = await fetch_all_concurrently(count_query, query)
+        total = count_rows[0][0] or 0
+    else:
+        (rows,) = await fetch_all_concurrently(query)
+        total = None
+    has_next = len(rows) > page_size
 
-    # Calculate has_next
-    has_next = (page * page_size) < total
+    files = [row[0] for row in rows[:page_size]]
+    episode_items = UPLOADED_FILE_LIST_ADAPTER.validate_python(files, from_attributes=True)
 
     return UploadedFileListResponse(
         items=episode_items,
@@ -101,51 +224,70 @@ async def list_files(
         page=page,
         page_size=page_size,
         has_next=has_next,
+        next_cursor=(
+            _encode_cursor(files[-1].created_at, files[-1].id) if has_next and files else None
+        ),
     )
 
 
 @router.get("/anime-titles", response_model=AnimeTitleListResponse)
 async def list_anime_titles(
-    db: AsyncSession = Depends(get_db),
-    current_user: str = Depends(get_current_user),
-) -> AnimeTitleListResponse:
+    db: DbDep,
+    current_user: UserDep,
+) -> Response:
     """
     Get list of all unique anime titles.
 
+    The JSON body is served from a per-process cache for
+    api_cache_ttl_seconds.
+
     Args:
         db: Database session.
         current_user: Authenticated user.
 
     Returns:
-        AnimeTitleListResponse: List of unique anime titles.
+        Response: AnimeTitleListResponse JSON.
     """
-    query = select(Anime).order_by(Anime.title)
+    body = await _cached("anime-titles", lambda: _load_anime_titles(db))
+    return Response(content=body, media_type="application/json")
+
+
+async def _load_anime_titles(db: AsyncSession) -> str:
+    """
+    Read every anime title from the database as AnimeTitleListResponse JSON.
+
+    On PostgreSQL json_agg builds the whole document in the database, so no
+    ORM objects or pydantic models are created; other backends go through
+    the ORM.
+
+    Args:
+        db: Database session.
+
+    Returns:
+        str: The serialised AnimeTitleListResponse.
+    """
+    if IS_POSTGRESQL:
+        result = await db.execute(ANIME_TITLES_JSON_QUERY)
+        return result.scalar_one()
+
+    query = lambda_stmt(
+        lambda: select(Anime).options(load_only(*ANIME_ITEM_COLUMNS)).order_by(Anime.title)
+    )
     result = await db.execute(query)
-    anime_rows = result.scalars().all()
-
-    titles = []
-    for anime in anime_rows:
-        # Split alt_titles by '|' and filter out empty strings
-        if anime.alt_titles:
-            alt_titles = [t for t in anime.alt_titles.split('|') if t]
-        else:
-            alt_titles = []
-        titles.append(AnimeTitleItem(
-            id=anime.id,
-            title=anime.title,
-            alt_titles=alt_titles
-        ))
-
-    return AnimeTitleListResponse(titles=titles, total=len(titles))
+    titles = ANIME_TITLE_LIST_ADAPTER.validate_python(result.scalars().all(), from_attributes=True)
+
+    return AnimeTitleListResponse(titles=titles, total=len(titles)).model_dump_json()
 
 @router.get("/stats", response_model=StatsResponse)
 async def get_stats(
-    db: AsyncSession = Depends(get_db),
-    current_user: str = Depends(get_current_user),
+    db: DbDep,
+    current_user: UserDep,
 ) -> StatsResponse:
     """
     Get database statistics.
 
+    Served from a per-process cache for api_cache_ttl_seconds.
+
     Args:
         db: Database session.
         current_user: Authenticated user.
@@ -153,8 +295,21 @@ async def get_stats(
     Returns:
         StatsResponse: Database statistics.
     """
-    query = (
-        select(
+    return await _cached("stats", lambda: _load_stats(db))
+
+
+async def _load_stats(db: AsyncSession) -> StatsResponse:
+    """
+    Aggregate the database statistics.
+
+    Args:
+        db: Database session.
+
+    Returns:
+        StatsResponse: Database statistics.
+    """
+    query = lambda_stmt(
+        lambda: select(
             func.count(UploadedFile.id).label("total_episodes"),
             func.count(func.distinct(Anime.id)).label("total_anime_titles"),
             func.coalesce(func.sum(UploadedFile.filesize), 0).label("total_size_bytes"),
@@ -176,8 +331,8 @@ async def get_stats(
 @router.get("/{file_id}", response_model=UploadedFileResponse)
 async def get_file(
     file_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: str = Depends(get_current_user),
+    db: DbDep,
+    current_user: UserDep,
 ) -> UploadedFileResponse:
     """
     Get a specific uploaded file by ID.
@@ -193,105 +348,101 @@ async def get_file(
     Raises:
         HTTPException: If file not found.
     """
-    # Join UploadedFile and Anime
-    query = (
-        select(UploadedFile, Anime)
-        .join(Anime, UploadedFile.anime_id == Anime.id)
+    # file_id becomes a bound parameter of the once-built statement
+    query = lambda_stmt(
+        lambda: select(UploadedFile)
+        .options(selectinload(UploadedFile.anime).load_only(*ANIME_ITEM_COLUMNS))
         .where(UploadedFile.id == file_id)
     )
     result = await db.execute(query)
-    row = result.first()
+    file = result.scalar_one_or_none()
 
-    if not row:
+    if not file:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"File with id {file_id} not found",
         )
 
-    file, anime = row
-
-    # Handle alt_titles as list
-    if anime and anime.alt_titles:
-        alt_titles = [t for t in anime.alt_titles.split('|') if t]
-    else:
-        alt_titles = []
-
-    anime_item = None
-    if anime:
-        anime_item = AnimeTitleItem(
-            id=anime.id,
-            title=anime.title,
-            alt_titles=alt_titles
-        )
-
-    # Build response
-    return UploadedFileResponse(
-        id=file.id,
-        anime_id=file.anime_id,
-        anime_title=file.anime_title,
-        episode=file.episode,
-        uploaded_chat_id=file.uploaded_chat_id,
-        uploader_user_id=file.uploader_user_id,
-        uploaded_message_id=file.uploaded_message_id,
-        vault_chat_id=file.vault_chat_id,
-        vault_message_id=file.vault_message_id,
-        ep_lang=file.ep_lang,
-        ep_qual=file.ep_qual,
-        filename=file.filename,
-        filesize=file.filesize,
-        created_at=file.created_at,
-        anime=anime_item
-    )
+    return UploadedFileResponse.model_validate(file)
 
 
 @router.get("/anime/{anime_id}/episodes", response_model=UploadedFileListResponse)
 async def list_episodes_for_anime(
     anime_id: int,
+    current_user: UserDep,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=100, description="Items per page"),
-    db: AsyncSession = Depends(get_db),
-    current_user: str = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    include_total: bool = Query(False, description="Count the anime's episodes on every page"),
 ) -> UploadedFileListResponse:
     """
     List all episodes for a specific anime.
 
+    The anime lookup, the page and, for the first offset page or when
+    include_total is set, the count are queried concurrently on separate
+    pooled sessions. With a cursor the page is found by keyset on
+    (episode, id) instead of OFFSET.
+
     Args:
-        anime_title: The anime title to filter by.
-        page: Page number (1-indexed).
-        page_size: Number of items per page.
-        db: Database session.
+        anime_id: The anime ID to filter by.
         current_user: Authenticated user.
+        page: Page number (1-indexed), ignored when cursor is given.
+        page_size: Number of items per page.
+        cursor: Optional keyset cursor from a previous response.
+        include_total: Whether to count the anime's episodes on every page.
 
     Returns:
         UploadedFileListResponse: Paginated list of episodes.
     """
-    # Fetch anime details
-    anime_result = await db.execute(select(Anime).where(Anime.id == anime_id))
-    anime = anime_result.scalar_one_or_none()
-    if not anime:
+    # Query anime details and episodes
+    anime_query = lambda_stmt(
+        lambda: select(Anime).options(load_only(*ANIME_ITEM_COLUMNS)).where(Anime.id == anime_id)
+    )
+    # The anime is returned once at the top level, not on every item
+    query = (
+        select(UploadedFile)
+        .options(noload(UploadedFile.anime))
+        .where(UploadedFile.anime_id == anime_id)
+    )
+    count_query = lambda_stmt(
+        lambda: select(func.count(UploadedFile.id)).where(UploadedFile.anime_id == anime_id)
+    )
+    query = query.order_by(UploadedFile.episode.asc(), UploadedFile.id.asc())
+    if cursor:
+        query = query.where(
+            _after_cursor(UploadedFile.episode, _decode_cursor(cursor, int), descending=False)
+        )
+    else:
+        query = query.offset((page - 1) * page_size)
+    # One extra row tells whether another page follows
+    query = query.limit(page_size + 1)
+
+    if include_total or (page == 1 and not cursor):
+        anime_rows, count_rows, file_rows = await fetch_all_concurrently(anime_query, count_query, query)
+        total = count_rows[0][0] or 0
+    else:
+        anime_rows, file_rows = await fetch_all_concurrently(anime_query, query)
+        total = None
+
+    if not anime_rows:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Anime with id {anime_id} not found",
         )
-    alt_titles = [t for t in anime.alt_titles.split('|') if t] if anime.alt_titles else []
-    anime_item = AnimeTitleItem(id=anime.id, title=anime.title, alt_titles=alt_titles)
-
-    # Query episodes
-    query = select(UploadedFile).where(UploadedFile.anime_id == anime_id)
-    count_query = select(func.count(UploadedFile.id)).where(UploadedFile.anime_id == anime_id)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-    offset = (page - 1) * page_size
-    query = query.order_by(UploadedFile.episode.asc()).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    files = result.scalars().all()
-    has_next = (page * page_size) < total
+    anime = anime_rows[0][0]
+    anime_item = AnimeTitleItem.model_validate(anime)
+
+    has_next = len(file_rows) > page_size
+    files = [row[0] for row in file_rows[:page_size]]
 
     return UploadedFileListResponse(
-        items=[UploadedFileResponse.model_validate(f) for f in files],
+        items=UPLOADED_FILE_LIST_ADAPTER.validate_python(files, from_attributes=True),
         total=total,
         page=page,
         page_size=page_size,
         has_next=has_next,
+        next_cursor=(
+            _encode_cursor(files[-1].episode, files[-1].id) if has_next and files else None
+        ),
         anime=anime_item
     )
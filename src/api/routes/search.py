@@ -4,17 +4,22 @@ Search API routes module.
 Provides endpoints for searching anime titles and uploaded files.
 """
 
-from typing import List
+import hashlib
+from typing import List, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
 
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
-from ..auth import get_current_user
-from ..database import get_db
-from anime_bot.models import Anime
-from ..schemas import AnimeTitleItem
+from ..auth import UserDep
+from ..cache import cache_get, cache_set
+from ..config import api_settings
+from ..database import IS_POSTGRESQL, DbDep
+from src.anime_bot.models import Anime
+from ..schemas import AnimeTitleItem, ANIME_TITLE_LIST_ADAPTER
+from .files import ANIME_ITEM_COLUMNS, ANIME_ITEM_JSON_SQL
 
 import logging
 
@@ -22,45 +27,87 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/search", tags=["Search Titles"])
 
+# The matching rows are picked first, then aggregated into one JSON array
+SEARCH_TITLES_JSON_QUERY = text(
+    f"SELECT coalesce(json_agg({ANIME_ITEM_JSON_SQL} ORDER BY title), '[]'::json)::text "
+    "FROM (SELECT id, title, alt_titles FROM anime WHERE title ILIKE :pattern "
+    "ORDER BY title LIMIT :limit) AS matches"
+)
+
+
+def _search_cache_key(query: str, limit: int) -> str:
+    """Build the Redis key for a search; ILIKE ignores case, so the key does too."""
+    digest = hashlib.blake2b(f"{query.lower()}\0{limit}".encode(), digest_size=16).hexdigest()
+    return f"search:{digest}"
+
+
 @router.get("/", response_model=List[AnimeTitleItem])
 async def search_titles(
+    db: DbDep,
+    current_user: UserDep,
     query: str = Query(..., min_length=1, description="Search query for anime titles"),
     limit: int = Query(10, ge=1, le=100, description="Maximum number of results to return"),
-    db: AsyncSession = Depends(get_db),
-    current_user: str = Depends(get_current_user),
-) -> List[AnimeTitleItem]:
+) -> Response:
     """
     Search for anime titles matching the query string.
 
+    Results are cached in Redis, shared by every worker, for
+    search_cache_ttl_seconds; titles change rarely, so entries only expire.
+
     Args:
+        db: Database session.
+        current_user: Authenticated user.
         query: The search query string.
         limit: Maximum number of results to return.
+    Returns:
+        Response: JSON list of matching anime titles.
+    """
+    key = _search_cache_key(query, limit)
+    body = await cache_get(key)
+    if body is None:
+        try:
+            body = await _search_titles_json(db, query, limit)
+        except Exception as e:
+            logger.error(f"Error searching titles: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="An error occurred while searching for titles."
+            )
+        await cache_set(key, body, api_settings.search_cache_ttl_seconds)
+    return Response(content=body, media_type="application/json")
+
+
+async def _search_titles_json(db: AsyncSession, query: str, limit: int) -> Union[str, bytes]:
+    """
+    Run a title search and serialise the matches as a JSON list.
+
+    On PostgreSQL the JSON array is built by json_agg in the database and
+    returned as is; other backends go through the ORM.
+
+    Args:
         db: Database session.
+        query: The search query string.
+        limit: Maximum number of results to return.
+
     Returns:
-        List of matching anime titles.
+        The JSON list of matching AnimeTitleItem objects.
     """
-    try:
-        stmt = (
-            select(Anime)
-            .where(Anime.title.ilike(f"%{query}%"))
-            .order_by(Anime.title)
-            .limit(limit)
+    if IS_POSTGRESQL:
+        result = await db.execute(
+            SEARCH_TITLES_JSON_QUERY, {"pattern": f"%{query}%", "limit": limit}
         )
-        result = await db.execute(stmt)
-        anime_rows = result.scalars().all()
-        items = []
-        for anime in anime_rows:
-            alt_titles = [t for t in anime.alt_titles.split('|') if t] if anime.alt_titles else []
-            items.append(AnimeTitleItem(
-                id=anime.id,
-                title=anime.title,
-                alt_titles=alt_titles
-            ))
-        logger.debug(f"Search query: {query}, Results found: {len(items)}")
-        return items
-    except Exception as e:
-        logger.error(f"Error searching titles: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while searching for titles."
-        )
\ No newline at end of file
+        logger.debug(f"Search query: {query}")
+        return result.scalar_one()
+
+    pattern = f"%{query}%"
+    stmt = lambda_stmt(
+        lambda: select(Anime)
+        .options(load_only(*ANIME_ITEM_COLUMNS))
+        .where(Anime.title.ilike(pattern))
+        .order_by(Anime.title)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    items = ANIME_TITLE_LIST_ADAPTER.validate_python(result.scalars().all(), from_attributes=True)
+    logger.debug(f"Search query: {query}, Results found: {len(items)}")
+    return ANIME_TITLE_LIST_ADAPTER.dump_json(items)
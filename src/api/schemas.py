@@ -3,8 +3,8 @@ Pydantic schemas for API request/response models.
 
 Defines data transfer objects for the API endpoints.
 """
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
+from typing import Any, Optional, List
 from datetime import datetime
 
 
@@ -25,6 +25,21 @@ class AnimeTitleItem(BaseModel):
     title: str
     alt_titles: List[str]
 
+    class Config:
+        """Pydantic config for ORM mode."""
+
+        from_attributes = True
+
+    @field_validator("alt_titles", mode="before")
+    @classmethod
+    def split_alt_titles(cls, value: Any) -> Any:
+        """Accept the '|'-separated string stored on the Anime model."""
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [t for t in value.split('|') if t]
+        return value
+
 class UploadedFileResponse(BaseModel):
     """Response schema for a single uploaded file."""
 
@@ -53,13 +68,22 @@ class UploadedFileListResponse(BaseModel):
     """Response schema for a list of uploaded files."""
 
     items: List[UploadedFileResponse]
-    total: int
+    # Only counted on the first offset page or with ?include_total=true
+    total: Optional[int] = None
     page: int
     page_size: int
     has_next: bool
+    # Pass as ?cursor= to fetch the following page by keyset
+    next_cursor: Optional[str] = None
     anime: Optional[AnimeTitleItem] = None
 
 
+# Validate whole result lists in one pydantic-core call instead of one
+# model_validate per row
+UPLOADED_FILE_LIST_ADAPTER = TypeAdapter(List[UploadedFileResponse])
+ANIME_TITLE_LIST_ADAPTER = TypeAdapter(List[AnimeTitleItem])
+
+
 class AnimeTitleListResponse(BaseModel):
     titles: List[AnimeTitleItem]
     total: int
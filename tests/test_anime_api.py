@@ -0,0 +1,77 @@
+"""Tests for the AnimePahe JSON API requests made by AnimePaheClient."""
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from src.anime_bot import anime_api  # noqa: E402
+
+LIBRARY_HEADERS = {"User-Agent": "test-agent", "Cookie": "__ddg2_=clearance"}
+
+
+class _FakeResponse:
+    def __init__(self, status: int = 200) -> None:
+        self.status = status
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                request_info=mock.Mock(), history=(), status=self.status
+            )
+
+    async def json(self, loads=None, content_type=None):
+        return {"data": [{"session": "abc", "title": "Frieren"}]}
+
+
+class _FakeRequest:
+    def __init__(self, status: int = 200) -> None:
+        self.status = status
+
+    async def __aenter__(self):
+        return _FakeResponse(self.status)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _client() -> anime_api.AnimePaheClient:
+    """Build a client around an object shaped like anime_downloader's AnimePaheAPI."""
+    client = anime_api.AnimePaheClient.__new__(anime_api.AnimePaheClient)
+    client._api = SimpleNamespace(
+        http=SimpleNamespace(headers=dict(LIBRARY_HEADERS)),
+        search=mock.Mock(return_value=[{"session": "lib", "title": "Frieren"}]),
+    )
+    client._constants = SimpleNamespace(get_base_url=lambda: "https://animepahe.example/")
+    client._verify_ssl = True
+    return client
+
+
+def test_search_uses_library_host_headers_and_cookie():
+    client = _client()
+    session = mock.Mock()
+    session.get.return_value = _FakeRequest()
+
+    with mock.patch.object(anime_api, "get_http_session", return_value=session):
+        results = asyncio.run(client.search("frieren"))
+
+    assert results == [{"session": "abc", "title": "Frieren"}]
+    (url,), kwargs = session.get.call_args
+    assert url == "https://animepahe.example/api"
+    assert kwargs["headers"] == LIBRARY_HEADERS
+    assert kwargs["params"] == {"m": "search", "q": "frieren"}
+    client._api.search.assert_not_called()
+
+
+def test_search_falls_back_to_library_on_403():
+    client = _client()
+    session = mock.Mock()
+    session.get.return_value = _FakeRequest(status=403)
+
+    with mock.patch.object(anime_api, "get_http_session", return_value=session):
+        results = asyncio.run(client.search("frieren"))
+
+    assert results == [{"session": "lib", "title": "Frieren"}]
+    client._api.search.assert_called_once_with("frieren")